@@ -0,0 +1,168 @@
+# Headless command line entry point driving the same Database and services as the GUI.
+import argparse
+import os
+import sys
+import time
+
+from config.settings import DATABASE_FILE, DATABASE_FORMAT, IMPORT_COLLECTION, WATCH_INTERVAL
+from .data.database import Database
+from .data.snapshot import SnapshotError
+from .services import export_service, import_service, thumbnail_service, verify_service
+from .services.color_index import ColorIndex
+from .services.folder_watcher import FolderWatcher
+from .services.metadata_service import MetadataCache, refresh_assets
+
+
+def print_progress(done, total, message):
+    """Stream one progress line per step so batch logs stay readable."""
+    print(f"[{done}/{total}] {message}", flush=True)
+
+
+def cmd_import(db, args):
+    new_ids = import_service.import_folder(db, args.folder, args.collection, args.workers, print_progress,
+                                           metadata_cache=MetadataCache())
+    print(f"Imported {len(new_ids)} assets into '{args.collection}'.")
+    return 0
+
+
+def cmd_export(db, args):
+    if args.collection not in db.data["Collections"]:
+        print(f"Collection '{args.collection}' not found.", file=sys.stderr)
+        return 1
+    if export_service.archive_format(args.destination):
+        stats = export_service.export_to_archive(db, args.collection, args.destination, args.workers, print_progress)
+        print(f"Exported {stats['files']} assets from '{args.collection}' "
+              f"({stats['bytes'] / 1e6:.1f} MB in {stats['seconds']:.1f} s, {stats['mb_per_s']:.1f} MB/s).")
+    else:
+        stats = export_service.export_to_folder(db, args.collection, args.destination, args.workers, print_progress)
+        print(f"Exported {stats['files']} assets from '{args.collection}'.")
+    for problem in stats["skipped"]:
+        print(f"skipped {problem}", file=sys.stderr)
+    return 1 if stats["skipped"] else 0
+
+
+def cmd_thumbnails(db, args):
+    try:
+        errors = thumbnail_service.generate_thumbnails(db, force=args.force, workers=args.workers, progress=print_progress)
+    except RuntimeError as error:
+        print(error, file=sys.stderr)
+        return 1
+    for error in errors:
+        print(error, file=sys.stderr)
+    return 1 if errors else 0
+
+
+def cmd_colors(db, args):
+    try:
+        errors = ColorIndex().analyze(db, force=args.force, workers=args.workers, progress=print_progress)
+    except RuntimeError as error:
+        print(error, file=sys.stderr)
+        return 1
+    for error in errors:
+        print(error, file=sys.stderr)
+    return 1 if errors else 0
+
+
+def cmd_watch(db, args):
+    watcher = FolderWatcher(db, interval=args.interval, metadata_cache=MetadataCache())
+    try:
+        color_index = ColorIndex()
+    except RuntimeError:
+        color_index = None
+    for folder in args.add:
+        watcher.add_folder(folder)
+    while True:
+        started = time.monotonic()
+        records = watcher.scan_records()
+        existing = import_service.known_paths(db)
+        new_ids = import_service.import_records(db, [record for record in records if record["path"] not in existing],
+                                                record=False)
+        # Only now may the snapshot remember these files as seen
+        watcher.save()
+        if new_ids:
+            try:
+                for error in thumbnail_service.generate_thumbnails(db, new_ids, workers=args.workers):
+                    print(error, file=sys.stderr)
+            except RuntimeError:
+                pass  # Pillow is not installed; colors are skipped below for the same reason
+        if new_ids and color_index is not None:
+            try:
+                color_index.analyze(db, new_ids, workers=args.workers)
+            except RuntimeError:
+                color_index = None  # Pillow is not installed
+        print(f"Scanned {len(watcher.folders())} folders in {time.monotonic() - started:.2f} s, "
+              f"imported {len(new_ids)} assets.", flush=True)
+        if args.once:
+            return 0
+        time.sleep(args.interval)
+
+
+def cmd_metadata(db, args):
+    updated = refresh_assets(db, MetadataCache(), workers=args.workers, progress=print_progress if args.verbose else None)
+    print(f"Updated metadata of {updated} assets.")
+    return 0
+
+
+def cmd_verify(db, args):
+    problems = verify_service.verify_database(db, args.workers, print_progress if args.verbose else None)
+    for problem in problems:
+        print(problem)
+    print(f"{len(problems)} problems found.")
+    return 1 if problems else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="run.py", description="AProject batch mode (no GUI).")
+    parser.add_argument("--db", default=DATABASE_FILE, help="database file to use")
+    parser.add_argument("--format", choices=("json", "binary"), default=DATABASE_FORMAT,
+                        help="format to save the database in (loading detects either)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of parallel workers")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="import a folder of images")
+    import_parser.add_argument("folder")
+    import_parser.add_argument("--collection", default=IMPORT_COLLECTION)
+    import_parser.set_defaults(func=cmd_import)
+
+    export_parser = commands.add_parser("export", help="export a collection to a folder or a .zip/.tar/.tar.gz archive")
+    export_parser.add_argument("collection")
+    export_parser.add_argument("destination", help="folder, or archive path (an interrupted archive export resumes)")
+    export_parser.set_defaults(func=cmd_export)
+
+    thumbnails_parser = commands.add_parser("thumbnails", help="generate missing thumbnails")
+    thumbnails_parser.add_argument("--force", action="store_true", help="regenerate every thumbnail")
+    thumbnails_parser.set_defaults(func=cmd_thumbnails)
+
+    colors_parser = commands.add_parser("colors", help="analyze dominant colors for the color filter")
+    colors_parser.add_argument("--force", action="store_true", help="re-analyze every asset")
+    colors_parser.set_defaults(func=cmd_colors)
+
+    watch_parser = commands.add_parser("watch", help="import new files from the watched folders")
+    watch_parser.add_argument("--add", action="append", default=[], metavar="FOLDER", help="start watching a folder")
+    watch_parser.add_argument("--interval", type=float, default=WATCH_INTERVAL, help="seconds between rescans")
+    watch_parser.add_argument("--once", action="store_true", help="scan once and exit")
+    watch_parser.set_defaults(func=cmd_watch)
+
+    metadata_parser = commands.add_parser("metadata", help="refresh header metadata of changed files")
+    metadata_parser.add_argument("--verbose", action="store_true", help="print a line per checked asset")
+    metadata_parser.set_defaults(func=cmd_metadata)
+
+    verify_parser = commands.add_parser("verify", help="check assets and collections")
+    verify_parser.add_argument("--verbose", action="store_true", help="print a line per checked asset")
+    verify_parser.set_defaults(func=cmd_verify)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        db = Database(args.db, args.format)
+    except SnapshotError as error:
+        print(f"Cannot load {args.db}: {error}", file=sys.stderr)
+        return 1
+    try:
+        return args.func(db, args)
+    except KeyboardInterrupt:
+        # Batches already committed stay in the database
+        print("Interrupted.", file=sys.stderr)
+        return 130
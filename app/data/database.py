@@ -1,11 +1,39 @@
 import json
+import os
+import uuid
+from contextlib import contextmanager
+
+from config.settings import DATABASE_FORMAT
+from . import snapshot
+
+# Marker for journal entries whose key did not exist before the mutation
+_MISSING = object()
+
+# Removals of up to this many ids locate each one instead of filtering the whole collection
+SMALL_REMOVAL = 32
+
 
 class Database:
-    def __init__(self, filename="database.json"):
+    def __init__(self, filename="database.json", file_format=DATABASE_FORMAT):
         self.filename = filename
+        self.file_format = file_format
         self.data = self.load()
+        # Journal of inverse operations for the open transaction (None when idle)
+        self._journal = None
+        self._depth = 0
+        # Reverse index: asset id -> set of collection names containing it
+        self.asset_index = {}
+        self.build_asset_index()
+        # Collection names sorted for the sidebar, rebuilt only after collections change
+        self._sorted_names = None
+        # Called with the journal of every committed transaction and whether it is a user edit
+        self.listeners = []
 
     def load(self):
+        # Binary snapshots are detected by their magic bytes; anything else is JSON.
+        # A corrupt snapshot raises SnapshotError: starting empty would overwrite it on the next save.
+        if snapshot.is_snapshot(self.filename):
+            return snapshot.read_snapshot(self.filename)
         try:
             with open(self.filename, "r") as file:
                 return json.load(file)
@@ -20,16 +48,318 @@ class Database:
             }
 
     def save(self):
-        with open(self.filename, "w") as file:
+        """Write the database atomically so a crash never leaves a half-written file."""
+        if self.file_format == "binary":
+            snapshot.write_snapshot(self.data, self.filename)
+            return
+        tmp_filename = self.filename + ".tmp"
+        with open(tmp_filename, "w") as file:
             json.dump(self.data, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_filename, self.filename)
+
+    @contextmanager
+    def transaction(self, record=True):
+        """Batch any number of mutations into a single validated, atomic save.
+
+        Transactions nest; only the outermost one validates and writes. If the
+        block raises, validation fails or the write fails, every mutation is
+        rolled back so memory always matches the file on disk. `record=False`
+        marks automatic changes (e.g. watched imports) that undo must skip;
+        the outermost transaction decides.
+        """
+        outermost = self._depth == 0
+        if outermost:
+            self._journal = []
+        self._depth += 1
+        try:
+            yield self
+            if outermost:
+                self._validate()
+                if self._journal:
+                    self.save()
+        except BaseException:
+            if outermost:
+                self._rollback()
+            raise
+        finally:
+            self._depth -= 1
+            if outermost:
+                journal, self._journal = self._journal, None
+        if outermost and journal:
+            for listener in self.listeners:
+                listener(journal, record)
+
+    def build_asset_index(self):
+        """Rebuild the asset -> collections reverse index from scratch."""
+        self.asset_index = {}
+        for name, button_data in self.data["Collections"].items():
+            self._index_collection(name, button_data)
+
+    def _index_collection(self, name, button_data):
+        for asset_id in button_data.get("content", []):
+            self.asset_index.setdefault(asset_id, set()).add(name)
+
+    def _unindex_collection(self, name, button_data):
+        for asset_id in button_data.get("content", []):
+            self._unindex(asset_id, name)
+
+    def _unindex(self, asset_id, name):
+        names = self.asset_index.get(asset_id)
+        if names is not None:
+            names.discard(name)
+            if not names:
+                del self.asset_index[asset_id]
+
+    def _set_item(self, section, key, value):
+        """Set or delete (value is _MISSING) an item, keeping the reverse index in sync."""
+        items = self.data[section]
+        if section == "Collections":
+            self._sorted_names = None
+        if section == "Collections" and key in items:
+            self._unindex_collection(key, items[key])
+        if value is _MISSING:
+            items.pop(key, None)
+        else:
+            items[key] = value
+            if section == "Collections":
+                self._index_collection(key, value)
+
+    def _put(self, section, key, value):
+        """Set data[section][key], journaling the previous value."""
+        self._journal.append(("put", section, key, self.data[section].get(key, _MISSING)))
+        self._set_item(section, key, value)
+
+    def _pop(self, section, key):
+        """Remove data[section][key], journaling the removed value."""
+        value = self.data[section][key]
+        self._journal.append(("put", section, key, value))
+        self._set_item(section, key, _MISSING)
+        return value
+
+    def _append_content(self, name, asset_id):
+        """Append an asset id to a collection, journaling the insertion."""
+        self.data["Collections"][name]["content"].append(asset_id)
+        self.asset_index.setdefault(asset_id, set()).add(name)
+        self._journal.append(("append", "Collections", name, asset_id))
+
+    def _remove_content(self, name, asset_id):
+        """Remove an asset id from a collection, journaling its position."""
+        content = self.data["Collections"][name]["content"]
+        index = content.index(asset_id)
+        del content[index]
+        self._unindex(asset_id, name)
+        self._journal.append(("remove", "Collections", name, (index, asset_id)))
+
+    def _remove_contents(self, name, asset_ids):
+        """Remove a set of asset ids from a collection in one pass, journaling their positions."""
+        content = self.data["Collections"][name]["content"]
+        if len(asset_ids) <= SMALL_REMOVAL:
+            # A few ids: list.index finds them much faster than a Python-level pass
+            removed = sorted((content.index(asset_id), asset_id) for asset_id in asset_ids
+                             if name in self.asset_index.get(asset_id, ()))
+            for index, _ in reversed(removed):
+                del content[index]
+        else:
+            removed = [(index, asset_id) for index, asset_id in enumerate(content) if asset_id in asset_ids]
+            content[:] = [asset_id for asset_id in content if asset_id not in asset_ids]
+        if not removed:
+            return
+        for _, asset_id in removed:
+            self._unindex(asset_id, name)
+        self._journal.append(("remove_many", "Collections", name, removed))
+
+    def _insert_contents(self, name, removed):
+        """Put (index, asset_id) pairs back at their ascending positions in one pass."""
+        content = self.data["Collections"][name]["content"]
+        merged = []
+        remaining = iter(content)
+        for index, asset_id in removed:
+            while len(merged) < index:
+                merged.append(next(remaining))
+            merged.append(asset_id)
+            self.asset_index.setdefault(asset_id, set()).add(name)
+        merged.extend(remaining)
+        content[:] = merged
+        self._journal.append(("insert_many", "Collections", name, list(removed)))
+
+    def _revert(self, journal):
+        """Apply the inverse of a journal, newest mutation first.
+
+        The inverse mutations are journaled themselves, so reverting that new
+        journal replays the original one (this is how redo works).
+        """
+        entries = list(reversed(journal))
+        i = 0
+        while i < len(entries):
+            op, section, key, old = entries[i]
+            if op == "put":
+                self._put(section, key, old)
+            elif op == "append":
+                # A run of appends to one collection is undone in a single pass
+                asset_ids = {old}
+                while i + 1 < len(entries) and entries[i + 1][0] == "append" and entries[i + 1][2] == key:
+                    i += 1
+                    asset_ids.add(entries[i][3])
+                self._remove_contents(key, asset_ids)
+            elif op == "remove":
+                self._insert_contents(key, [old])
+            elif op == "remove_many":
+                self._insert_contents(key, old)
+            elif op == "insert_many":
+                self._remove_contents(key, {asset_id for _, asset_id in old})
+            i += 1
+
+    def _rollback(self):
+        """Undo the journaled mutations of the open transaction in reverse order."""
+        journal, self._journal = self._journal, []
+        self._revert(journal)
+        self._journal = []
+
+    def revert(self, journal):
+        """Revert a committed journal as a new transaction (used by undo/redo)."""
+        with self.transaction():
+            self._revert(journal)
+
+    def _validate(self):
+        """Check what the open transaction added to collections, so the cost follows the change.
+
+        Collections that were put are checked whole; appended and re-inserted
+        ids are checked on their own.
+        """
+        collections = self.data["Collections"]
+        assets = self.data["Assets"]
+        for op, section, name, old in self._journal:
+            if section != "Collections" or name not in collections:
+                continue
+            if op == "put":
+                button_data = collections[name]
+                if not isinstance(button_data, dict) or not isinstance(button_data.get("content"), list):
+                    raise ValueError(f"Collection '{name}' must be a dict with a 'content' list.")
+                if button_data.get("name") != name:
+                    raise ValueError(f"Collection '{name}' has mismatched name '{button_data.get('name')}'.")
+                added = button_data["content"]
+            elif op == "append":
+                added = [old]
+            elif op == "insert_many":
+                added = [asset_id for _, asset_id in old]
+            else:
+                continue
+            missing = [asset_id for asset_id in added if asset_id not in assets]
+            if missing:
+                raise ValueError(f"Collection '{name}' references unknown assets: {missing[:5]}")
+
+    def set_config(self, key, value):
+        """Set an AppConfig value with one write."""
+        with self.transaction():
+            self._put("AppConfig", key, value)
 
     def add_button(self, button_name, button_data):
-        self.data["Collections"][button_name] = button_data
-        self.save()
+        """Add a new collection; an existing one is never replaced (that would orphan its assets)."""
+        if button_name in self.data["Collections"]:
+            raise ValueError(f"Collection '{button_name}' already exists.")
+        with self.transaction():
+            self._put("Collections", button_name, button_data)
 
     def remove_button(self, button_name):
         if button_name in self.data["Collections"]:
-            del self.data["Collections"][button_name]
-            self.save()
+            with self.transaction():
+                self._pop("Collections", button_name)
         else:
-            print(f"Button '{button_name}' not found in Collections.")
\ No newline at end of file
+            print(f"Button '{button_name}' not found in Collections.")
+
+    def rename_button(self, old_name, new_name):
+        """Rename a collection, keeping its content, with one write."""
+        if old_name not in self.data["Collections"]:
+            print(f"Button '{old_name}' not found in Collections.")
+            return
+        if new_name in self.data["Collections"]:
+            raise ValueError(f"Collection '{new_name}' already exists.")
+        with self.transaction():
+            button_data = dict(self._pop("Collections", old_name), name=new_name)
+            self._put("Collections", new_name, button_data)
+
+    def add_many(self, buttons):
+        """Add several new collections with one write. `buttons` maps names to button data."""
+        with self.transaction():
+            for button_name, button_data in dict(buttons).items():
+                self.add_button(button_name, button_data)
+
+    def remove_many(self, button_names):
+        """Remove several collections with one write, skipping unknown names."""
+        with self.transaction():
+            for button_name in button_names:
+                if button_name in self.data["Collections"]:
+                    self._pop("Collections", button_name)
+                else:
+                    print(f"Button '{button_name}' not found in Collections.")
+
+    def add_asset(self, asset_data, asset_id=None):
+        """Register an asset under a stable id and return the id."""
+        asset_id = asset_id or uuid.uuid4().hex
+        with self.transaction():
+            self._put("Assets", asset_id, dict(asset_data, id=asset_id))
+        return asset_id
+
+    def update_assets(self, records):
+        """Replace several asset records with one write. `records` maps asset ids to records."""
+        with self.transaction():
+            for asset_id, record in dict(records).items():
+                if asset_id not in self.data["Assets"]:
+                    raise KeyError(f"Asset '{asset_id}' not found in Assets.")
+                self._put("Assets", asset_id, dict(record, id=asset_id))
+
+    def remove_asset(self, asset_id):
+        """Delete an asset and drop it from every collection that references it."""
+        if asset_id not in self.data["Assets"]:
+            print(f"Asset '{asset_id}' not found in Assets.")
+            return
+        with self.transaction():
+            for name in list(self.asset_index.get(asset_id, ())):
+                self._remove_content(name, asset_id)
+            self._pop("Assets", asset_id)
+
+    def add_to_collection(self, button_name, asset_ids):
+        """Add assets to a collection, skipping ones it already contains."""
+        with self.transaction():
+            for asset_id in asset_ids:
+                if asset_id not in self.data["Assets"]:
+                    raise KeyError(f"Asset '{asset_id}' not found in Assets.")
+                if button_name not in self.asset_index.get(asset_id, ()):
+                    self._append_content(button_name, asset_id)
+
+    def remove_from_collection(self, button_name, asset_ids):
+        """Remove assets from a collection in one pass, skipping ones it does not contain."""
+        with self.transaction():
+            self._remove_contents(button_name, set(asset_ids))
+
+    def move_assets(self, source_name, target_name, asset_ids):
+        """Move assets from one collection to another as a single commit."""
+        if source_name == target_name:
+            return
+        with self.transaction():
+            self.add_to_collection(target_name, asset_ids)
+            self.remove_from_collection(source_name, asset_ids)
+
+    def copy_assets(self, target_name, asset_ids):
+        """Copy assets into another collection as a single commit."""
+        self.add_to_collection(target_name, asset_ids)
+
+    def sorted_collection_names(self):
+        """Return the collection names sorted case-insensitively (cached)."""
+        if self._sorted_names is None:
+            self._sorted_names = sorted(self.data["Collections"], key=str.lower)
+        return self._sorted_names
+
+    def collections_for(self, asset_id):
+        """Return the set of collection names that contain the asset."""
+        return self.asset_index.get(asset_id, set())
+
+    def ref_count(self, asset_id):
+        """Return how many collections reference the asset."""
+        return len(self.asset_index.get(asset_id, ()))
+
+    def orphan_assets(self):
+        """Return the ids of assets that no collection references."""
+        return [asset_id for asset_id in self.data["Assets"] if asset_id not in self.asset_index]
@@ -0,0 +1,98 @@
+# Undo/redo history built from the Database transaction journals.
+from collections import deque
+
+from config.settings import HISTORY_DEPTH, HISTORY_MEMORY_CAP
+
+# Rough per-item sizes (bytes) used to estimate what a history step keeps alive
+ENTRY_COST = 120
+ITEM_COST = 80
+
+
+def journal_cost(journal):
+    """Estimate the memory held by a journal: proportional to the change, not the library."""
+    cost = 0
+    for op, section, key, old in journal:
+        cost += ENTRY_COST
+        if isinstance(old, dict):
+            cost += ITEM_COST * (len(old) + len(old.get("content", ())))
+        elif isinstance(old, list):
+            cost += ITEM_COST * len(old)
+    return cost
+
+
+class History:
+    """Undo and redo stacks of committed transactions.
+
+    Each step is the inverse-operation journal of one transaction, so it only
+    holds the values that transaction replaced. Undoing a step reverts its
+    journal in a new transaction whose own journal becomes the redo step.
+    The oldest steps are dropped beyond `depth` steps or `memory_cap` bytes.
+    """
+
+    def __init__(self, db, depth=HISTORY_DEPTH, memory_cap=HISTORY_MEMORY_CAP):
+        self.db = db
+        self.depth = depth
+        self.memory_cap = memory_cap
+        self.undo_stack = deque()
+        self.redo_stack = deque()
+        self.memory = 0
+        self._replaying = None
+        db.listeners.append(self.on_commit)
+
+    def on_commit(self, journal, record=True):
+        # Automatic commits and configuration changes (e.g. watched folders) are not user edits
+        if not record or all(section == "AppConfig" for _, section, _, _ in journal):
+            return
+        step = (journal, journal_cost(journal))
+        if self._replaying == "undo":
+            self.redo_stack.append(step)
+        elif self._replaying == "redo":
+            self.undo_stack.append(step)
+        else:
+            self.undo_stack.append(step)
+            self._clear(self.redo_stack)
+        self.memory += step[1]
+        self._trim()
+
+    def _clear(self, stack):
+        self.memory -= sum(cost for _, cost in stack)
+        stack.clear()
+
+    def _trim(self):
+        """Drop the oldest steps until the depth and memory limits hold."""
+        while self.undo_stack and (len(self.undo_stack) > self.depth or self.memory > self.memory_cap):
+            _, cost = self.undo_stack.popleft()
+            self.memory -= cost
+        if self.memory > self.memory_cap:
+            self._clear(self.redo_stack)
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self):
+        """Revert the newest step. Returns False if there is nothing to undo."""
+        return self._replay(self.undo_stack, "undo")
+
+    def redo(self):
+        """Re-apply the newest undone step. Returns False if there is nothing to redo."""
+        return self._replay(self.redo_stack, "redo")
+
+    def _replay(self, stack, mode):
+        if not stack:
+            return False
+        journal, cost = stack.pop()
+        self.memory -= cost
+        self._replaying = mode
+        try:
+            self.db.revert(journal)
+        except Exception:
+            # Keep the step so the history stays consistent with the data
+            stack.append((journal, cost))
+            self.memory += cost
+            raise
+        finally:
+            self._replaying = None
+        return True
@@ -0,0 +1,310 @@
+# Compact binary snapshot format for the Database.
+#
+# Layout (little endian):
+#
+#     magic b"APSNAP", version (u16), section count (u16)
+#     per section: name length (u8), name, offset (u64), length (u64), crc32 (u32)
+#     section payloads
+#
+# Sections are "Strings" (asset ids, collection names and asset string fields,
+# stored once), "AppConfig", "UserData", "Collections" and "Assets". Each is
+# checksummed and can be read on its own, so AppConfig, UserData and Collections
+# load without reading the Assets payload.
+#
+# Version 2 stores asset columns as typed binary arrays; version 1 files, whose
+# columns are JSON lists, are still read.
+import json
+import os
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate, repeat
+
+MAGIC = b"APSNAP"
+VERSION = 2
+READABLE_VERSIONS = (1, 2)
+HEADER = struct.Struct("<6sHH")
+ENTRY = struct.Struct("<QQI")
+SECTIONS = ("Strings", "AppConfig", "UserData", "Collections", "Assets")
+
+# Stands for an "id" field that equals the record's key and is not stored
+_ID = object()
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def is_snapshot(filename):
+    try:
+        with open(filename, "rb") as file:
+            return file.read(len(MAGIC)) == MAGIC
+    except FileNotFoundError:
+        return False
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def _u32_array(values):
+    packed = array("I", values)
+    if packed.itemsize != 4:
+        packed = array("L", values)
+    return packed
+
+
+def _pack(values):
+    """The little endian bytes of an array."""
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _unpack(values, data):
+    """Append the little endian `data` to the array `values` and return it."""
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class _StringTable:
+    def __init__(self):
+        self.strings = []
+        self.index = {}
+
+    def add(self, string):
+        position = self.index.get(string)
+        if position is None:
+            position = self.index[string] = len(self.strings)
+            self.strings.append(string)
+        return position
+
+    def encode(self):
+        """Count, length count, lengths and text. Strings without a NUL are stored NUL separated, with no lengths."""
+        text = "\0".join(self.strings)
+        lengths = _u32_array([])
+        if text.count("\0") != max(len(self.strings) - 1, 0):
+            lengths.extend(len(string) for string in self.strings)
+            text = "".join(self.strings)
+        return struct.pack("<II", len(self.strings), len(lengths)) + _pack(lengths) + text.encode("utf-8")
+
+
+def _decode_strings(payload, version=VERSION):
+    if version == 1:
+        (count,) = struct.unpack_from("<I", payload)
+        length_count, start = count, 4
+    else:
+        count, length_count = struct.unpack_from("<II", payload)
+        start = 8
+    lengths = _unpack(_u32_array([]), payload[start:start + 4 * length_count])
+    text = payload[start + 4 * length_count:].decode("utf-8")
+    if count and not length_count:
+        return text.split("\0")
+    ends = list(accumulate(lengths))
+    return [text[end - length:end] for end, length in zip(ends, lengths)]
+
+
+def _encode_collections(collections, strings):
+    """A JSON list of [name index, other fields, item count] followed by every content id index."""
+    header = []
+    content = _u32_array([])
+    for name, button_data in collections.items():
+        fields = {key: value for key, value in button_data.items() if key not in ("name", "content")}
+        header.append([strings.add(name), fields, len(button_data["content"])])
+        content.extend(strings.add(asset_id) for asset_id in button_data["content"])
+    encoded = _dumps(header)
+    return struct.pack("<I", len(encoded)) + encoded + _pack(content)
+
+
+def _decode_collections(payload, strings):
+    (length,) = struct.unpack_from("<I", payload)
+    header = json.loads(payload[4:4 + length])
+    content = _unpack(_u32_array([]), payload[4 + length:])
+    collections = {}
+    position = 0
+    for name_index, fields, count in header:
+        name = strings[name_index]
+        ids = [strings[i] for i in content[position:position + count]]
+        position += count
+        collections[name] = dict(fields, name=name, content=ids)
+    return collections
+
+
+def _encode_column(values, strings, blob):
+    """Describe one asset column for the JSON header, appending its binary form to `blob`.
+
+    Columns of one scalar repeated are stored once; columns of only strings,
+    ints or floats become u32 string indices, i64 or f64 arrays. Anything
+    else stays a JSON list.
+    """
+    types = set(map(type, values))
+    if len(types) == 1:
+        kind = types.pop()
+        if kind in (type(None), bool, int, float, str) and values.count(values[0]) == len(values):
+            return ["c", values[0]]
+        if kind is str:
+            column = _u32_array(map(strings.add, values))
+        elif kind is int and -2 ** 63 <= min(values) and max(values) < 2 ** 63:
+            column = array("q", values)
+        elif kind is float:
+            column = array("d", values)
+        else:
+            column = None
+        if column is not None:
+            spec = ["s" if kind is str else column.typecode, len(blob)]
+            blob.extend(_pack(column))
+            return spec
+    return ["j", values]
+
+
+def _decode_column(spec, count, blob, strings):
+    kind, value = spec
+    if kind == "c":
+        return repeat(value, count)
+    if kind == "j":
+        return value
+    column = _u32_array([]) if kind == "s" else array(kind)
+    _unpack(column, blob[value:value + count * column.itemsize])
+    return list(map(strings.__getitem__, column)) if kind == "s" else column.tolist()
+
+
+def _encode_assets(assets, strings):
+    """Asset records grouped by their field layout and stored column by column.
+
+    Records are written as a JSON list of groups [fields, item count, column
+    specs], the id indices of every record group after group, and the binary
+    columns. An "id" field equal to the record's key is not stored but rebuilt
+    from the key.
+    """
+    groups = {}
+    for asset_id, record in assets.items():
+        fields = tuple(_ID if key == "id" and value == asset_id else key for key, value in record.items())
+        group = groups.get(fields)
+        if group is None:
+            group = groups[fields] = ([], [[] for field in fields if field is not _ID])
+        group[0].append(strings.add(asset_id))
+        column = 0
+        for field, value in zip(fields, record.values()):
+            if field is not _ID:
+                group[1][column].append(value)
+                column += 1
+
+    header = []
+    ids = _u32_array([])
+    blob = bytearray()
+    for fields, (group_ids, columns) in groups.items():
+        specs = [_encode_column(column, strings, blob) for column in columns]
+        header.append([[None if field is _ID else field for field in fields], len(group_ids), specs])
+        ids.extend(group_ids)
+    encoded = _dumps(header)
+    return struct.pack("<II", len(encoded), len(ids)) + encoded + _pack(ids) + bytes(blob)
+
+
+def _decode_assets(payload, strings, version=VERSION):
+    if version == 1:
+        (length,) = struct.unpack_from("<I", payload)
+        header = json.loads(payload[4:4 + length])
+        id_indices = _unpack(_u32_array([]), payload[4 + length:])
+        blob = b""
+    else:
+        length, id_count = struct.unpack_from("<II", payload)
+        header = json.loads(payload[8:8 + length])
+        start = 8 + length
+        id_indices = _unpack(_u32_array([]), payload[start:start + 4 * id_count])
+        blob = memoryview(payload)[start + 4 * id_count:]
+    assets = {}
+    position = 0
+    for fields, count, columns in header:
+        ids = list(map(strings.__getitem__, id_indices[position:position + count]))
+        position += count
+        if version > 1:
+            columns = [_decode_column(spec, count, blob, strings) for spec in columns]
+        # The key doubles as the "id" column (a null field name marks it)
+        columns = iter(columns)
+        columns = [ids if field is None else next(columns) for field in fields]
+        keys = ["id" if field is None else field for field in fields]
+        if not keys:
+            assets.update((asset_id, {}) for asset_id in ids)
+            continue
+        assets.update(zip(ids, map(dict, map(zip, repeat(keys), zip(*columns)))))
+    return assets
+
+
+def write_snapshot(data, filename):
+    """Write `data` as a snapshot, atomically replacing `filename`."""
+    strings = _StringTable()
+    payloads = {
+        "AppConfig": _dumps(data.get("AppConfig", {})),
+        "UserData": _dumps(data.get("UserData", {})),
+        "Collections": _encode_collections(data.get("Collections", {}), strings),
+        "Assets": _encode_assets(data.get("Assets", {}), strings),
+    }
+    payloads["Strings"] = strings.encode()
+
+    table = [HEADER.pack(MAGIC, VERSION, len(SECTIONS))]
+    offset = HEADER.size + sum(1 + len(name) + ENTRY.size for name in SECTIONS)
+    for name in SECTIONS:
+        payload = payloads[name]
+        table.append(struct.pack("<B", len(name)) + name.encode("ascii") + ENTRY.pack(offset, len(payload), zlib.crc32(payload)))
+        offset += len(payload)
+
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "wb") as file:
+        file.write(b"".join(table))
+        for name in SECTIONS:
+            file.write(payloads[name])
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_filename, filename)
+
+
+def _read_table(file):
+    magic, version, count = HEADER.unpack(file.read(HEADER.size))
+    if magic != MAGIC:
+        raise SnapshotError("not a database snapshot")
+    if version not in READABLE_VERSIONS:
+        raise SnapshotError(f"unsupported snapshot version {version}")
+    table = {}
+    for _ in range(count):
+        (name_length,) = struct.unpack("<B", file.read(1))
+        try:
+            name = file.read(name_length).decode("ascii")
+        except UnicodeDecodeError:
+            raise SnapshotError("corrupt section table")
+        table[name] = ENTRY.unpack(file.read(ENTRY.size))
+    return version, table
+
+
+def _read_section(file, table, name):
+    if name not in table:
+        raise SnapshotError(f"section {name} is missing")
+    offset, length, checksum = table[name]
+    file.seek(offset)
+    payload = file.read(length)
+    if len(payload) != length or zlib.crc32(payload) != checksum:
+        raise SnapshotError(f"section {name} is corrupt")
+    return payload
+
+
+def read_snapshot(filename, sections=SECTIONS[1:]):
+    """Read the requested sections of a snapshot; unrequested sections are never read."""
+    with open(filename, "rb") as file:
+        try:
+            version, table = _read_table(file)
+        except struct.error:
+            raise SnapshotError("truncated snapshot header")
+        data = {}
+        for name in ("AppConfig", "UserData"):
+            if name in sections:
+                data[name] = json.loads(_read_section(file, table, name))
+        if "Collections" in sections or "Assets" in sections:
+            strings = _decode_strings(_read_section(file, table, "Strings"), version)
+            if "Collections" in sections:
+                data["Collections"] = _decode_collections(_read_section(file, table, "Collections"), strings)
+            if "Assets" in sections:
+                data["Assets"] = _decode_assets(_read_section(file, table, "Assets"), strings, version)
+        return data
@@ -1,7 +1,20 @@
 import tkinter as tk
 import customtkinter as ctk
 from ..data.database import Database
+from ..data.history import History
+from config.settings import IMPORT_BATCH_SIZE, IMPORT_COLLECTION, SORT_OPTIONS, THUMBNAIL_LEVELS
 import tkinter.messagebox as messagebox
+import tkinter.filedialog as filedialog
+import tkinter.colorchooser as colorchooser
+import threading
+import queue
+from ..services import export_service, import_service, thumbnail_service
+from ..services.folder_watcher import FolderWatcher
+from ..services.sort_index import SortIndex
+from ..services.memory_budget import MemoryBudget
+from ..services.metadata_service import MetadataCache
+from .utils import ThumbnailCache
+from ..services.color_index import ColorIndex
 
 # Creating the Page base class
 class Page(tk.Frame):
@@ -82,16 +95,15 @@ class Page(tk.Frame):
 
     def populate_collections_from_db(self, inner_frame):
         """Populate the scrollable frame with buttons from the database."""
-        collections = self.parent.db.data["Collections"]
-        # Sort collections by their names
-        sorted_collections = sorted(collections.items(), key=lambda x: x[0].lower())
+        # Collection names sorted case-insensitively; the database caches this order
+        sorted_names = self.parent.db.sorted_collection_names()
 
         # First, clear all existing buttons
         for widget in inner_frame.winfo_children():
             widget.destroy()
 
         # Populate sorted collections
-        for name, data in sorted_collections:
+        for name in sorted_names:
             button = ctk.CTkButton(
                 inner_frame,  
                 text=name,
@@ -125,6 +137,11 @@ class Page(tk.Frame):
         self.parent.selected = name
         print(self.parent.selected)
         clicked_button.configure(fg_color="#174f7a")
+        self.parent.selection_changed()
+
+    def on_selection_changed(self):
+        """Hook for pages that display the selected collection."""
+        pass
 
         
     def add_new_button(self):
@@ -145,6 +162,9 @@ class Page(tk.Frame):
     def save_button(self, entry_widget):
         """Save the new collection button and its data."""
         name = entry_widget.get().strip()
+        if name in self.parent.db.data["Collections"]:
+            messagebox.showinfo("Add Collection", f"A collection named \n{name} already exists.")
+            return
         if name:
             button_data = {
                 "name": name,
@@ -169,6 +189,7 @@ class Page(tk.Frame):
                 # Repopulate collections which will now be in sorted order
                 self.populate_collections_from_db(self.inner_frame)
                 self.parent.selected = None
+                self.parent.selection_changed()
         else:
             # Inform the user to select a collection first
             mb = messagebox.showinfo("Delete Collection", "Please select a collection to delete.")
@@ -184,40 +205,102 @@ class CollectionsPage(Page):
         self.after(100, lambda: parent._bind_to_mousewheel(self.scrollable_frame))
         
         # Add widgets for the collections page here
+        self.color_filter = None
+        self.tile_size = 256
+        self.create_toolbar()
         self.create_masonry_layout()
         self.after_idle(self.initial_layout_pass)
         
+    def on_selection_changed(self):
+        """Show the content of the newly selected collection."""
+        self.populate_masonry_frame()
+        self.adjust_masonry_layout(self.canvas.winfo_width())
+
     def initial_layout_pass(self):
         """Perform layout after the window is displayed and the sizes are known."""
         self.adjust_masonry_layout(self.canvas.winfo_width())
         
+    def create_toolbar(self):
+        """Create the sort and filter toolbar above the masonry grid."""
+        self.toolbar = tk.Frame(self, bg=self['bg'])
+        self.toolbar.pack(side="top", fill="x")
+
+        self.sort_menu = ctk.CTkOptionMenu(self.toolbar, values=SORT_OPTIONS, corner_radius=0, command=lambda _: self.apply_sort())
+        self.sort_menu.pack(side="left", padx=(10, 2), pady=5)
+        self.reverse_var = tk.BooleanVar(value=False)
+        reverse_box = ctk.CTkCheckBox(self.toolbar, text="Descending", variable=self.reverse_var, command=self.apply_sort)
+        reverse_box.pack(side="left", padx=2, pady=5)
+
+        self.name_filter = ctk.CTkEntry(self.toolbar, placeholder_text="Filter by name", corner_radius=0)
+        self.name_filter.pack(side="left", padx=2, pady=5)
+        self.name_filter.bind("<KeyRelease>", lambda event: self.apply_sort())
+
+        # Zoom steps are exactly the pyramid levels, so tiles never need rescaling
+        self.zoom_control = ctk.CTkSegmentedButton(self.toolbar, values=[str(edge) for edge in THUMBNAIL_LEVELS],
+                                                   command=lambda value: self.set_zoom(int(value)))
+        self.zoom_control.set(str(self.tile_size))
+        self.zoom_control.pack(side="right", padx=10, pady=5)
+
+        if self.parent.color_index is None:
+            return  # Color filtering needs NumPy
+
+        self.color_button = ctk.CTkButton(self.toolbar, text="Filter by color", corner_radius=0, command=self.choose_color_filter)
+        self.color_button.pack(side="left", padx=(10, 2), pady=5)
+        clear_button = ctk.CTkButton(self.toolbar, text="Clear", corner_radius=0, width=60, command=lambda: self.set_color_filter(None))
+        clear_button.pack(side="left", padx=2, pady=5)
+
+    def choose_color_filter(self):
+        rgb, hex_color = colorchooser.askcolor(title="Filter by color")
+        if rgb is not None:
+            self.set_color_filter(tuple(int(channel) for channel in rgb), hex_color)
+
+    def set_color_filter(self, rgb, hex_color=None):
+        """Show only assets whose dominant colors match `rgb` (None shows everything)."""
+        self.color_filter = rgb
+        self.color_button.configure(fg_color=hex_color or "#1f6aa5")
+        self.apply_sort()
+
     def create_masonry_layout(self):
         # Create a canvas for the masonry layout
-        self.canvas = tk.Canvas(self, bg=self['bg'])
+        self.canvas = tk.Canvas(self, bg=self['bg'], highlightthickness=0)
         self.canvas.pack(side="left", fill="both", expand=True)
 
         # Configure the scrollbar properly
         self.scrollbar = ctk.CTkScrollbar(self, command=self.canvas.yview)
         self.scrollbar.pack(side="right", fill="y")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.canvas.configure(yscrollcommand=self.on_canvas_scroll)
 
-        # Create a frame inside the canvas to hold the widgets
-        self.masonry_frame = tk.Frame(self.canvas, bg=self['bg'])
-        self.canvas_frame = self.canvas.create_window((0, 0), window=self.masonry_frame, anchor="nw")
+        # Tiles are canvas windows created only for the visible rows
+        self.order = []
+        self.position = {}
+        self.tiles = {}
+        self.render_pending = False
+
+        # Multi-selection: one flag byte per position in self.order
+        self.selection = bytearray()
+        self.anchor = None
+        self.band = None
+        self.drag = None
 
-        self.masonry_frame.bind("<Configure>", self.on_frame_configure)
         self.canvas.bind("<Configure>", self.on_canvas_configure)
+        self.canvas.bind("<MouseWheel>", self.on_tile_mousewheel)
+        self.canvas.bind("<Button-1>", self.on_band_start)
+        self.canvas.bind("<B1-Motion>", self.on_band_drag)
+        self.canvas.bind("<ButtonRelease-1>", self.on_band_end)
 
         # Populate with widgets or call a function to populate it
         self.populate_masonry_frame()
-        
-        self.parent._bind_to_mousewheel(self.masonry_frame)
-        # self.parent._bind_to_mousewheel(self.canvas)
-        
 
-    def on_frame_configure(self, event=None):
-        '''Reset the scroll region to encompass the inner frame'''
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+    def on_canvas_scroll(self, first, last):
+        '''Keep the scrollbar in sync and render the rows that scrolled into view.'''
+        self.scrollbar.set(first, last)
+        self.schedule_render()
+
+    def on_tile_mousewheel(self, event):
+        delta = -1 * (event.delta // 120) if self.tk.call('tk', 'windowingsystem') == 'win32' else -1 * event.delta
+        self.canvas.yview_scroll(int(delta), "units")
+        # Stop the app-wide bind_all handler from scrolling the grid a second time
+        return "break"
 
     def on_canvas_configure(self, event):
         '''Adjust the masonry layout based on the canvas width.'''
@@ -226,21 +309,268 @@ class CollectionsPage(Page):
 
     def adjust_masonry_layout(self, canvas_width):
         '''Adjust the masonry layout based on the canvas width.'''
-        widget_width = 210  # widget width + padx
-        num_columns = max(1, canvas_width // widget_width)
-        # Adjust the layout of widgets based on the number of columns
-        for widget in self.widgets:
-            widget.grid_forget()  # Forget the pack to reset the layout
-        for i, widget in enumerate(self.widgets):
-            widget.grid(row=i // num_columns, column=i % num_columns, padx=10, pady=10)
+        widget_width = self.tile_size + 10  # widget width + padx
+        self.num_columns = max(1, canvas_width // widget_width)
+        rows = -(-len(self.order) // self.num_columns)
+        self.canvas.configure(scrollregion=(0, 0, canvas_width, rows * widget_width + 10))
+        self.render_visible()
+
+    def set_zoom(self, tile_size):
+        """Switch the tile size, keeping the first visible asset in view; only visible tiles are rebuilt."""
+        if tile_size == self.tile_size:
+            return
+        widget_width = self.tile_size + 10
+        first_index = int(self.canvas.canvasy(0) // widget_width) * getattr(self, "num_columns", 1)
+
+        for frame, window in self.tiles.values():
+            self.canvas.delete(window)
+            frame.destroy()
+        self.tiles = {}
+        self.tile_size = tile_size
+        self.adjust_masonry_layout(self.canvas.winfo_width())
+
+        rows = -(-len(self.order) // self.num_columns)
+        if rows:
+            self.canvas.yview_moveto((first_index // self.num_columns) / rows)
+        self.render_visible()
+
+    def schedule_render(self):
+        """Coalesce the many scroll events of one gesture into a single render."""
+        if not self.render_pending:
+            self.render_pending = True
+            self.after_idle(self.render_visible)
+
+    def render_visible(self):
+        """Create, move or destroy tiles so that exactly the visible rows are shown."""
+        self.render_pending = False
+        widget_width = self.tile_size + 10
+        columns = getattr(self, "num_columns", 1)
+        top = self.canvas.canvasy(0)
+        first_row = max(0, int(top // widget_width))
+        last_row = int((top + self.canvas.winfo_height()) // widget_width) + 1
+        visible = self.order[first_row * columns:(last_row + 1) * columns]
+        self.parent.thumbnail_cache.set_visible([(asset_id, self.tile_size) for asset_id in visible])
+
+        wanted = set(visible)
+        for asset_id in [asset_id for asset_id in self.tiles if asset_id not in wanted]:
+            frame, window = self.tiles.pop(asset_id)
+            self.canvas.delete(window)
+            frame.destroy()
+
+        for i, asset_id in enumerate(visible, first_row * columns):
+            x = (i % columns) * widget_width + 10
+            y = (i // columns) * widget_width + 10
+            if asset_id in self.tiles:
+                self.canvas.coords(self.tiles[asset_id][1], x, y)
+            else:
+                frame = self.create_tile(asset_id)
+                window = self.canvas.create_window((x, y), window=frame, anchor="nw")
+                self.tiles[asset_id] = (frame, window)
+
+    def create_tile(self, asset_id):
+        db = self.parent.db
+        asset = db.data["Assets"].get(asset_id, {})
+        color = self.tile_color(asset_id)
+        frame = tk.Frame(self.canvas, width=self.tile_size, height=self.tile_size, bg=color)
+        frame.grid_propagate(False)
+
+        # One seek into the asset's pyramid for the level matching the zoom, unless already decoded
+        frame.image = self.parent.thumbnail_cache.get(asset_id, self.tile_size)
+        if frame.image is not None:
+            name_label = tk.Label(frame, image=frame.image, bg=color, borderwidth=0)
+        else:
+            # No thumbnail yet: show the name and, from the cached header metadata, the dimensions
+            text = asset.get("name", asset_id)
+            if asset.get("width"):
+                text += f"\n{asset['width']} x {asset['height']}"
+            name_label = tk.Label(frame, text=text, bg=color, fg="white", wraplength=self.tile_size - 10)
+        name_label.place(relx=0.5, rely=0.5, anchor="center")
+
+        # "Also in" badge: the reverse index answers this without scanning collections
+        others = db.ref_count(asset_id) - 1
+        if others > 0:
+            badge = tk.Label(frame, text=f"+{others}", bg="#174f7a", fg="white")
+            badge.place(relx=1.0, rely=0.0, anchor="ne")
+
+        frame.name_label = name_label
+        for widget in (frame, name_label):
+            widget.bind("<MouseWheel>", self.on_tile_mousewheel)
+            widget.bind("<Button-1>", lambda event, a=asset_id: self.on_tile_press(event, a))
+            widget.bind("<B1-Motion>", self.on_tile_drag)
+            widget.bind("<ButtonRelease-1>", self.on_tile_release)
+        return frame
+
+    def tile_color(self, asset_id):
+        position = self.position.get(asset_id)
+        return "#174f7a" if position is not None and self.selection[position] else "#5a5a5a"
+
+    def refresh_selection(self):
+        """Recolor the visible tiles after the selection changed."""
+        for asset_id, (frame, _) in self.tiles.items():
+            color = self.tile_color(asset_id)
+            frame.configure(bg=color)
+            frame.name_label.configure(bg=color)
+
+    def selected_assets(self):
+        return [self.order[i] for i, flag in enumerate(self.selection) if flag]
+
+    def on_tile_press(self, event, asset_id):
+        """Click selects one tile, Ctrl+click toggles it, Shift+click selects a range."""
+        position = self.position[asset_id]
+        ctrl, shift = event.state & 0x4, event.state & 0x1
+        toggle = None
+        if shift and self.anchor is not None:
+            start, end = sorted((self.anchor, position))
+            if not ctrl:
+                self.selection = bytearray(len(self.order))
+            self.selection[start:end + 1] = b"\x01" * (end - start + 1)
+        elif ctrl:
+            if self.selection[position]:
+                # Deselected on release unless a drag starts: Ctrl+drag copies the whole selection
+                toggle = position
+            else:
+                self.selection[position] = 1
+            self.anchor = position
+        else:
+            if not self.selection[position]:
+                # Pressing an already selected tile keeps the selection so it can be dragged
+                self.selection = bytearray(len(self.order))
+                self.selection[position] = 1
+            self.anchor = position
+        self.drag = {"x": event.x_root, "y": event.y_root, "active": False, "toggle": toggle}
+        self.refresh_selection()
+
+    def on_tile_drag(self, event):
+        if self.drag is None:
+            return
+        if not self.drag["active"] and abs(event.x_root - self.drag["x"]) + abs(event.y_root - self.drag["y"]) > 8:
+            self.drag["active"] = True
+            self.configure(cursor="hand2")
+
+    def on_tile_release(self, event):
+        """Dropping selected tiles on a sidebar collection moves them (Ctrl copies)."""
+        drag, self.drag = self.drag, None
+        self.configure(cursor="")
+        if drag is None:
+            return
+        if not drag["active"]:
+            if drag["toggle"] is not None:
+                self.selection[drag["toggle"]] = 0
+                self.refresh_selection()
+            return
+        widget = self.winfo_containing(event.x_root, event.y_root)
+        while widget is not None and not hasattr(widget, "custom_text"):
+            widget = widget.master
+        if widget is None:
+            return
+        self.transfer_selection(widget.custom_text, copy=bool(event.state & 0x4))
+
+    def transfer_selection(self, target_name, copy=False):
+        """Move or copy the selected assets to another collection in one database commit."""
+        asset_ids = self.selected_assets()
+        source_name = self.parent.selected
+        if not asset_ids or target_name == source_name:
+            return
+        if copy:
+            self.parent.db.copy_assets(target_name, asset_ids)
+        else:
+            self.parent.db.move_assets(source_name, target_name, asset_ids)
+        self.selection = bytearray()
+        self.reload()
+
+    def on_band_start(self, event):
+        """Start a rubber-band selection on the empty canvas."""
+        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        # Ctrl+drag adds to the current selection instead of replacing it
+        self.band = {"x": x, "y": y,
+                     "base": bytes(self.selection) if event.state & 0x4 else bytes(len(self.order)),
+                     "item": self.canvas.create_rectangle(x, y, x, y, outline="#1f6aa5", width=2)}
+
+    def on_band_drag(self, event):
+        if self.band is None:
+            return
+        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        self.canvas.coords(self.band["item"], self.band["x"], self.band["y"], x, y)
+        self.select_rectangle(self.band["x"], self.band["y"], x, y)
+
+    def on_band_end(self, event):
+        if self.band is not None:
+            self.canvas.delete(self.band["item"])
+            self.band = None
+
+    def select_rectangle(self, x0, y0, x1, y1):
+        """Select every cell the rectangle touches, computed from the grid geometry."""
+        widget_width = self.tile_size + 10
+        columns = self.num_columns
+        first_column = max(0, int(min(x0, x1) // widget_width))
+        last_column = min(columns - 1, int(max(x0, x1) // widget_width))
+        first_row = max(0, int(min(y0, y1) // widget_width))
+        last_row = int(max(y0, y1) // widget_width)
+
+        self.selection = bytearray(self.band["base"])
+        if first_column <= last_column:
+            for row in range(first_row, last_row + 1):
+                start = row * columns + first_column
+                end = min(row * columns + last_column + 1, len(self.order))
+                if start >= end:
+                    break
+                self.selection[start:end] = b"\x01" * (end - start)
+        self.refresh_selection()
+
+    def visible_order(self):
+        """Return the selected collection's asset ids in the current sort and filter."""
+        collection_name = self.parent.selected
+        if collection_name not in self.parent.db.data["Collections"]:
+            return []
+        order = self.parent.sort_index.order(collection_name, self.sort_menu.get(), self.reverse_var.get())
+
+        text = self.name_filter.get().strip().lower()
+        if text:
+            assets = self.parent.db.data["Assets"]
+            order = [asset_id for asset_id in order if text in assets.get(asset_id, {}).get("name", "").lower()]
+        if self.color_filter is not None:
+            # One vectorized distance computation over the whole index
+            matching = set(self.parent.color_index.filter(order, self.color_filter))
+            order = [asset_id for asset_id in order if asset_id in matching]
+        return order
+
+    def apply_sort(self):
+        """Swap in the cached order for the current options; existing tiles are reused."""
+        selected = set(self.selected_assets())
+        self.order = self.visible_order()
+        self.position = {asset_id: i for i, asset_id in enumerate(self.order)}
+        self.selection = bytearray(len(self.order))
+        for asset_id in selected:
+            if asset_id in self.position:
+                self.selection[self.position[asset_id]] = 1
+        self.adjust_masonry_layout(self.canvas.winfo_width())
+        self.refresh_selection()
+
+    def reload(self):
+        """Re-read the collection after a commit; visible tiles are rebuilt so badges stay current."""
+        # The sort index was patched by the commit; only visible tiles are rebuilt
+        self.apply_sort()
+        self.rebuild_tiles()
+
+    def rebuild_tiles(self):
+        """Recreate the visible tiles, e.g. after their thumbnails or badges changed."""
+        for frame, window in self.tiles.values():
+            frame.destroy()
+            self.canvas.delete(window)
+        self.tiles = {}
+        self.render_visible()
 
     def populate_masonry_frame(self):
-        # Example of populating the frame with widgets
-        self.widgets = []
-        for i in range(20):
-            frame = tk.Frame(self.masonry_frame, width=200, height=200, bg=f"#{i*12:02x}{i*12:02x}{i*12:02x}")
-            frame.grid(padx=10, pady=10)
-            self.widgets.append(frame)
+        """Show the selected collection from the top, rebuilding every tile."""
+        for frame, window in self.tiles.values():
+            self.canvas.delete(window)
+            frame.destroy()
+        self.tiles = {}
+        self.order = self.visible_order()
+        self.position = {asset_id: i for i, asset_id in enumerate(self.order)}
+        self.selection = bytearray(len(self.order))
+        self.anchor = None
+        self.canvas.yview_moveto(0)
 
 class ImportPage(Page):
     def __init__(self, parent=None, color="#474747"):
@@ -248,6 +578,57 @@ class ImportPage(Page):
         super().__init__(parent, color)
         self.show_sidebar()
         # Add widgets for the import page here
+        self.create_watch_widgets()
+
+    def create_watch_widgets(self):
+        """Create the list of watched folders and its add button."""
+        add_button = ctk.CTkButton(
+            self,
+            text="+ Watched Folder",
+            corner_radius=0,
+            font=ctk.CTkFont(size=17),
+            height=50,
+            command=self.add_watched_folder
+        )
+        add_button.pack(padx=20, pady=(20, 10), anchor="w")
+
+        self.watch_frame = tk.Frame(self, bg=self['bg'])
+        self.watch_frame.pack(fill="x", padx=20)
+        self.populate_watched_folders()
+
+        self.status_label = ctk.CTkLabel(self, text="")
+        self.status_label.pack(padx=20, pady=10, anchor="w")
+
+    def populate_watched_folders(self):
+        """List every watched folder with a button to stop watching it."""
+        for widget in self.watch_frame.winfo_children():
+            widget.destroy()
+
+        for folder in self.parent.folder_watcher.folders():
+            row = tk.Frame(self.watch_frame, bg=self['bg'])
+            row.pack(fill="x", pady=2)
+            ctk.CTkLabel(row, text=folder, anchor="w").pack(side="left", fill="x", expand=True)
+            remove_button = ctk.CTkButton(
+                row,
+                text="Remove",
+                corner_radius=0,
+                width=80,
+                fg_color="red",
+                command=lambda f=folder: self.remove_watched_folder(f)
+            )
+            remove_button.pack(side="right")
+
+    def add_watched_folder(self):
+        folder = filedialog.askdirectory(title="Watch Folder")
+        if folder:
+            self.parent.folder_watcher.add_folder(folder)
+            self.populate_watched_folders()
+            # Import what is already there without waiting for the next rescan
+            self.parent.rescan_watched_folders()
+
+    def remove_watched_folder(self, folder):
+        self.parent.folder_watcher.remove_folder(folder)
+        self.populate_watched_folders()
 
 class UsbPage(Page):
     def __init__(self, parent=None, color="#474747"):
@@ -255,12 +636,93 @@ class UsbPage(Page):
         super().__init__(parent, color)
         self.show_sidebar()
         # Add widgets for the usb page here
+        self.export_thread = None
+        self.export_status = ""
+        self.create_export_widgets()
+
+    def create_export_widgets(self):
+        """Create the widgets for packaging the selected collection into an archive."""
+        export_button = ctk.CTkButton(
+            self,
+            text="Export collection to archive",
+            corner_radius=0,
+            font=ctk.CTkFont(size=17),
+            height=50,
+            command=self.export_selected
+        )
+        export_button.pack(padx=20, pady=(20, 10), anchor="w")
+
+        self.status_label = ctk.CTkLabel(self, text="Select a collection, then choose a .zip, .tar or .tar.gz file.")
+        self.status_label.pack(padx=20, anchor="w")
+
+    def export_selected(self):
+        """Export the selected collection in a background thread."""
+        if self.export_thread is not None and self.export_thread.is_alive():
+            return
+        if self.parent.selected is None:
+            mb = messagebox.showinfo("Export Collection", "Please select a collection to export.")
+            self.center_messagebox(mb)
+            return
+
+        destination = filedialog.asksaveasfilename(
+            title="Export Collection",
+            initialfile=f"{self.parent.selected}.zip",
+            filetypes=[("Zip archive", "*.zip"), ("Gzipped tar archive", "*.tar.gz"), ("Tar archive", "*.tar")]
+        )
+        if not destination:
+            return
+
+        collection_name = self.parent.selected
+        self.export_status = f"Exporting {collection_name}..."
+        self.export_thread = threading.Thread(target=self.run_export, args=(collection_name, destination), daemon=True)
+        self.export_thread.start()
+        self.poll_export()
+
+    def run_export(self, collection_name, destination):
+        """Runs in the export thread; only touches export_status, never Tk widgets."""
+        def progress(done, total, message):
+            self.export_status = f"[{done}/{total}] {message}"
+        try:
+            stats = export_service.export_to_archive(self.parent.db, collection_name, destination, progress=progress)
+            self.export_status = f"Exported {stats['files']} assets at {stats['mb_per_s']:.1f} MB/s."
+            if stats["skipped"]:
+                self.export_status += f" Skipped {len(stats['skipped'])} unreadable files."
+        except Exception as error:
+            self.export_status = f"Export failed: {error} (run it again to resume)"
+
+    def poll_export(self):
+        """Copy the export thread's status into the label until it finishes."""
+        self.status_label.configure(text=self.export_status)
+        if self.export_thread.is_alive():
+            self.after(200, self.poll_export)
 
 class SettingsPage(Page):
     def __init__(self, parent=None, color="#474747"):
         print("Initializing SettingsPage")
         super().__init__(parent, color)
         # Add widgets for the settings page here
+        self.create_memory_widgets()
+
+    def create_memory_widgets(self):
+        """Create the memory usage table, one row per registered cache."""
+        title = ctk.CTkLabel(self, text="Memory usage", font=ctk.CTkFont(size=17, weight="bold"))
+        title.pack(padx=20, pady=(20, 10), anchor="w")
+        self.memory_frame = tk.Frame(self, bg=self['bg'])
+        self.memory_frame.pack(fill="x", padx=20)
+        self.memory_labels = {}
+        self.refresh_memory_usage()
+
+    def refresh_memory_usage(self):
+        """Update the usage figures every second."""
+        budget = self.parent.memory_budget
+        usage = budget.usage()
+        rows = list(usage.items()) + [("Total", sum(usage.values())), ("Limit", budget.limit)]
+        for name, size in rows:
+            if name not in self.memory_labels:
+                self.memory_labels[name] = ctk.CTkLabel(self.memory_frame, anchor="w")
+                self.memory_labels[name].pack(fill="x")
+            self.memory_labels[name].configure(text=f"{name}: {size / (1024 * 1024):.1f} MB")
+        self.after(1000, self.refresh_memory_usage)
 
     def show_sidebar(self):
         """Override the show_sidebar method to do nothing for the SettingsPage."""
@@ -274,6 +736,20 @@ class App(tk.Tk):  # Changed from ctk.CTk to tk.Tk
         super().__init__()
         self.configure(bg="#474747")
         self.db = Database()
+        self.folder_watcher = FolderWatcher(self.db, metadata_cache=MetadataCache())
+        try:
+            self.color_index = ColorIndex()
+        except RuntimeError:
+            self.color_index = None
+
+        # Every in-memory cache is accounted against one global budget
+        self.memory_budget = MemoryBudget()
+        self.thumbnail_cache = ThumbnailCache(self.memory_budget)
+        self.sort_index = SortIndex(self.db, self.color_index, self.memory_budget)
+        self.history = History(self.db)
+        self.memory_budget.register("Undo history", size=lambda: self.history.memory)
+        if self.color_index is not None:
+            self.memory_budget.register("Color index", size=self.color_index.nbytes)
         self.configure_app()
         self.create_sidebar_frame()
         self.create_navbar()
@@ -292,6 +768,124 @@ class App(tk.Tk):  # Changed from ctk.CTk to tk.Tk
         # Bind the mousewheel to the root window
         self.bind_all("<MouseWheel>", self._on_mousewheel)
 
+        # Undo/redo for collection and asset edits
+        self.bind_all("<Control-z>", self.undo)
+        self.bind_all("<Control-y>", self.redo)
+        self.bind_all("<Control-Z>", self.redo)
+
+        # Watch import folders in the background; new files are committed on the Tk thread
+        self.watch_queue = queue.Queue()
+        self.color_queue = queue.Queue()
+        self.thumbnail_queue = queue.Queue()
+        self.asset_jobs = queue.Queue()
+        threading.Thread(target=self.run_asset_jobs, name="AssetJobs", daemon=True).start()
+        self.pending_imports = []
+        self.importing = False
+        self.watch_imported = 0
+        self.folder_watcher.start(self.watch_queue.put)
+        self.after(1000, self.poll_watched_imports)
+
+    def rescan_watched_folders(self):
+        """Rescan the watched folders now, in the watcher's background thread."""
+        self.folder_watcher.rescan_now()
+
+    def poll_watched_imports(self):
+        """Queue records found by the folder watcher for import into "Newly Imported"."""
+        records = []
+        while not self.watch_queue.empty():
+            records.extend(self.watch_queue.get_nowait())
+        if records:
+            existing = import_service.known_paths(self.db)
+            self.pending_imports.extend(record for record in records if record["path"] not in existing)
+            if not self.importing:
+                self.importing = True
+                self.import_watched_batch()
+        self.poll_thumbnails()
+        self.poll_color_analysis()
+        self.after(1000, self.poll_watched_imports)
+
+    def import_watched_batch(self):
+        """Commit one batch per Tk tick so a large first scan never freezes the window.
+
+        Batches grow with the library, so the number of full saves stays small
+        and each tick costs about as much as one ordinary edit.
+        """
+        batch_size = max(IMPORT_BATCH_SIZE, len(self.db.data["Assets"]) // 4)
+        batch = self.pending_imports[:batch_size]
+        del self.pending_imports[:batch_size]
+        try:
+            if batch:
+                # Automatic imports are not user edits: Ctrl+Z must not undo them
+                new_ids = import_service.import_records(self.db, batch, batch_size=batch_size, record=False)
+                self.watch_imported += len(new_ids)
+                self.process_new_assets(new_ids)
+        except Exception as error:
+            # Release the watcher without marking the files as seen, so the next scan retries them
+            failed = batch + self.pending_imports
+            self.pending_imports = []
+            self.importing = False
+            self.folder_watcher.abandon([record["path"] for record in failed])
+            print(f"Watched import failed: {error}")
+            self.pages[ImportPage].status_label.configure(text=f"Watched import failed: {error} (retrying at the next scan)")
+            return
+        if self.pending_imports:
+            self.after(1, self.import_watched_batch)
+            return
+        self.importing = False
+        # Every record of the scan is committed, so the snapshot may remember the files
+        self.folder_watcher.save()
+        self.pages[ImportPage].status_label.configure(text=f"Imported {self.watch_imported} files from watched folders since start.")
+        if self.selected == IMPORT_COLLECTION:
+            self.pages[CollectionsPage].reload()
+
+    def process_new_assets(self, asset_ids):
+        """Queue new assets for thumbnail pyramids and color analysis in the background worker."""
+        if asset_ids:
+            self.asset_jobs.put(asset_ids)
+
+    def run_asset_jobs(self):
+        """Background worker: build pyramids, then analyze colors from their small levels.
+
+        One job runs at a time so batches never compete for the cores. Results
+        go back to the Tk thread through queues.
+        """
+        while True:
+            asset_ids = self.asset_jobs.get()
+            try:
+                for error in thumbnail_service.generate_thumbnails(self.db, asset_ids):
+                    print(error)
+                self.thumbnail_queue.put(asset_ids)
+                if self.color_index is not None:
+                    results, _ = self.color_index.compute(self.db, asset_ids)
+                    self.color_queue.put(results)
+            except RuntimeError:
+                pass  # Pillow is not installed: tiles keep their name placeholders
+            except Exception as error:
+                # Keep the worker alive for later batches, e.g. when an asset was deleted meanwhile
+                print(f"Processing new assets failed: {error}")
+
+    def poll_thumbnails(self):
+        """Show pyramids the worker finished: drop their cached entries and rebuild the visible tiles."""
+        asset_ids = []
+        while not self.thumbnail_queue.empty():
+            asset_ids.extend(self.thumbnail_queue.get_nowait())
+        if not asset_ids:
+            return
+        self.thumbnail_cache.discard(asset_ids)
+        self.pages[CollectionsPage].rebuild_tiles()
+
+    def poll_color_analysis(self):
+        """Add finished color analyses to the index on the Tk thread, which is the one querying it."""
+        results = []
+        while not self.color_queue.empty():
+            results.extend(self.color_queue.get_nowait())
+        if not results:
+            return
+        self.color_index.add_many(results)
+        self.color_index.save()
+        self.sort_index.invalidate(sort_option="Color")
+        self.pages[CollectionsPage].apply_sort()
+
     def _on_mousewheel(self, event):
         widget = event.widget
         if hasattr(widget, 'yview'):
@@ -359,5 +953,34 @@ class App(tk.Tk):  # Changed from ctk.CTk to tk.Tk
     def show_page(self, page_class):
         print(f"Showing page: {page_class.__name__}")
         page = self.pages[page_class]
+        self.current_page = page
         page.show_sidebar()
         page.tkraise()
+
+    def selection_changed(self):
+        """Let every page follow the selected collection, not only the one showing the sidebar."""
+        for page in self.pages.values():
+            page.on_selection_changed()
+
+    def typing(self):
+        """True while a text entry has the focus; its own Ctrl+Z/Ctrl+Y must win."""
+        try:
+            return isinstance(self.focus_get(), tk.Entry)
+        except KeyError:
+            return False
+
+    def undo(self, event=None):
+        if not self.typing() and self.history.undo():
+            self.refresh_views()
+
+    def redo(self, event=None):
+        if not self.typing() and self.history.redo():
+            self.refresh_views()
+
+    def refresh_views(self):
+        """Redraw the sidebar and the grid after the data changed underneath them."""
+        if self.selected not in self.db.data["Collections"]:
+            self.selected = None
+        if hasattr(self.current_page, "inner_frame"):
+            self.current_page.populate_collections_from_db(self.current_page.inner_frame)
+        self.pages[CollectionsPage].reload()
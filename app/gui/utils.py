@@ -1 +1,55 @@
 # This file will contain GUI utility functions. It's currently empty as you did not provide any utility functions specific to GUI.
+import tkinter as tk
+
+from ..services import thumbnail_service
+
+
+class ThumbnailCache:
+    """Decoded thumbnail PhotoImages keyed by (asset id, edge), sized against the memory budget.
+
+    Evicting an entry drops the cache's reference and Tk frees the image.
+    Images shown by visible tiles are pinned instead: evicting them would not
+    free their pixels, and the next `get` would decode a second copy.
+    """
+
+    name = "Thumbnails"
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.images = {}
+        budget.register(self.name, evict=self.evict, cost=1.0)
+
+    def get(self, asset_id, edge):
+        """Return the PhotoImage for the pyramid level nearest `edge`, or None without a thumbnail."""
+        key = (asset_id, edge)
+        if key in self.images:
+            self.budget.touch(self.name, key)
+            return self.images[key]
+
+        level = thumbnail_service.read_level(thumbnail_service.pyramid_path(asset_id), edge)
+        if level is None:
+            # Not cached: the pyramid may be written later and must show up then
+            return None
+        image = tk.PhotoImage(data=level[1])
+        self.images[key] = image
+        # Decoded RGBA pixels
+        self.budget.charge(self.name, key, image.width() * image.height() * 4)
+        return image
+
+    def set_visible(self, keys):
+        """Pin the (asset id, edge) keys of the tiles on screen, unpinning every other one."""
+        self.budget.pin(self.name, keys)
+
+    def discard(self, asset_ids):
+        """Drop the cached images of assets whose pyramid was (re)written."""
+        asset_ids = set(asset_ids)
+        for key in [key for key in self.images if key[0] in asset_ids]:
+            del self.images[key]
+            self.budget.release(self.name, key)
+
+    def evict(self, key):
+        self.images.pop(key, None)
+
+    def clear(self):
+        self.images.clear()
+        self.budget.release_all(self.name)
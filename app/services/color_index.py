@@ -0,0 +1,207 @@
+# Dominant-color index over asset thumbnails, queried with vectorized NumPy.
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from config.settings import COLOR_INDEX_FILE, COLOR_MATCH_DISTANCE, COLOR_PALETTE_SIZE
+from .thumbnail_service import pyramid_path, read_level
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; without it there is no color filtering
+    np = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Colors are histogrammed into 4 x 4 x 4 RGB bins
+HISTOGRAM_LEVELS = 4
+HISTOGRAM_BINS = HISTOGRAM_LEVELS ** 3
+ANALYSIS_SIZE = 64
+
+
+def analyze_pixels(pixels, palette_size=COLOR_PALETTE_SIZE):
+    """Return (palette, weights, histogram) for an (N, 3) uint8 pixel array.
+
+    The palette holds the mean color of the `palette_size` most populated bins
+    and `weights` their share of the pixels; unused slots have weight 0.
+    """
+    pixels = pixels.reshape(-1, 3).astype(np.int64)
+    bins = pixels // (256 // HISTOGRAM_LEVELS)
+    bin_ids = (bins[:, 0] * HISTOGRAM_LEVELS + bins[:, 1]) * HISTOGRAM_LEVELS + bins[:, 2]
+    counts = np.bincount(bin_ids, minlength=HISTOGRAM_BINS)
+    sums = np.stack([np.bincount(bin_ids, weights=pixels[:, channel], minlength=HISTOGRAM_BINS) for channel in range(3)], axis=1)
+
+    total = max(int(counts.sum()), 1)
+    top = np.argsort(counts)[::-1][:palette_size]
+    palette = np.zeros((palette_size, 3), dtype=np.uint8)
+    weights = np.zeros(palette_size, dtype=np.float32)
+    used = counts[top] > 0
+    palette[used] = (sums[top][used] / counts[top][used, None]).round().astype(np.uint8)
+    weights[used] = counts[top][used] / total
+    return palette, weights, (counts / total).astype(np.float32)
+
+
+def analyze_image(source, palette_size=COLOR_PALETTE_SIZE):
+    """Analyze an image given as a path or a file object."""
+    with Image.open(source) as image:
+        image = image.convert("RGB")
+        image.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE))
+        return analyze_pixels(np.asarray(image), palette_size)
+
+
+class ColorIndex:
+    """Palette, weights and histogram of every analyzed asset, one array row per asset."""
+
+    def __init__(self, filename=COLOR_INDEX_FILE, palette_size=COLOR_PALETTE_SIZE):
+        if np is None:
+            raise RuntimeError("NumPy is required for the color index.")
+        self.filename = filename
+        self.palette_size = palette_size
+        self.asset_ids = []
+        self.rows = {}
+        self.palettes = np.zeros((0, palette_size, 3), dtype=np.uint8)
+        self.weights = np.zeros((0, palette_size), dtype=np.float32)
+        self.histograms = np.zeros((0, HISTOGRAM_BINS), dtype=np.float32)
+        self.load()
+
+    def load(self):
+        try:
+            with np.load(self.filename) as arrays:
+                palettes = arrays["palettes"]
+                if palettes.shape[1] != self.palette_size:
+                    return  # Palette size changed: start over
+                self.asset_ids = [str(asset_id) for asset_id in arrays["asset_ids"]]
+                self.palettes = palettes
+                self.weights = arrays["weights"]
+                self.histograms = arrays["histograms"]
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            return
+        self.rows = {asset_id: row for row, asset_id in enumerate(self.asset_ids)}
+
+    def save(self):
+        tmp_filename = self.filename + ".tmp.npz"
+        np.savez(tmp_filename, asset_ids=np.array(self.asset_ids, dtype=str), palettes=self.palettes,
+                 weights=self.weights, histograms=self.histograms)
+        os.replace(tmp_filename, self.filename)
+
+    def nbytes(self):
+        """Approximate memory held by the index arrays and the id lookup."""
+        return self.palettes.nbytes + self.weights.nbytes + self.histograms.nbytes + 150 * len(self.asset_ids)
+
+    def __contains__(self, asset_id):
+        return asset_id in self.rows
+
+    def __len__(self):
+        return len(self.asset_ids)
+
+    def add_many(self, results):
+        """Add or replace rows from (asset_id, (palette, weights, histogram)) pairs."""
+        new_ids, new_rows = [], []
+        for asset_id, analysis in results:
+            if asset_id in self.rows:
+                row = self.rows[asset_id]
+                self.palettes[row], self.weights[row], self.histograms[row] = analysis
+            else:
+                new_ids.append(asset_id)
+                new_rows.append(analysis)
+        if not new_rows:
+            return
+        # One concatenate per batch keeps appends amortized
+        palettes, weights, histograms = zip(*new_rows)
+        self.palettes = np.concatenate([self.palettes, np.stack(palettes)])
+        self.weights = np.concatenate([self.weights, np.stack(weights)])
+        self.histograms = np.concatenate([self.histograms, np.stack(histograms)])
+        for asset_id in new_ids:
+            self.rows[asset_id] = len(self.asset_ids)
+            self.asset_ids.append(asset_id)
+
+    def remove(self, asset_id):
+        """Drop an asset's row by moving the last row into its slot."""
+        row = self.rows.pop(asset_id, None)
+        if row is None:
+            return
+        last = len(self.asset_ids) - 1
+        if row != last:
+            moved_id = self.asset_ids[last]
+            self.asset_ids[row] = moved_id
+            self.rows[moved_id] = row
+            self.palettes[row] = self.palettes[last]
+            self.weights[row] = self.weights[last]
+            self.histograms[row] = self.histograms[last]
+        self.asset_ids.pop()
+        self.palettes = self.palettes[:last]
+        self.weights = self.weights[:last]
+        self.histograms = self.histograms[:last]
+
+    def analyze(self, db, asset_ids=None, force=False, workers=None, progress=None):
+        """Analyze assets not yet in the index (from their smallest thumbnail level when one exists) and save."""
+        results, errors = self.compute(db, asset_ids, force, workers, progress)
+        self.add_many(results)
+        assets = db.data["Assets"]
+        for asset_id in [asset_id for asset_id in self.asset_ids if asset_id not in assets]:
+            self.remove(asset_id)
+        self.save()
+        return errors
+
+    def compute(self, db, asset_ids=None, force=False, workers=None, progress=None):
+        """Analyze pending assets without touching the index. Returns (results for add_many, errors).
+
+        Safe to run in a worker thread while the index is being queried.
+        """
+        if Image is None:
+            raise RuntimeError("Pillow is required to analyze colors.")
+        assets = db.data["Assets"]
+        asset_ids = list(assets) if asset_ids is None else list(asset_ids)
+        pending = [asset_id for asset_id in asset_ids if force or asset_id not in self.rows]
+
+        def analyze_asset(asset_id):
+            level = read_level(pyramid_path(asset_id), ANALYSIS_SIZE)
+            source = io.BytesIO(level[1]) if level else assets[asset_id]["path"]
+            try:
+                return asset_id, analyze_image(source, self.palette_size)
+            except Exception as error:
+                return asset_id, error
+
+        results, errors = [], []
+        # Decoding and resizing in Pillow releases the GIL, so threads use every core
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for done, (asset_id, result) in enumerate(pool.map(analyze_asset, pending), 1):
+                if isinstance(result, Exception):
+                    errors.append(f"{asset_id}: {result}")
+                else:
+                    results.append((asset_id, result))
+                if progress:
+                    progress(done, len(pending), asset_id)
+        return results, errors
+
+    def distances(self, rgb):
+        """Distance from `rgb` to every asset's palette, as one vectorized computation.
+
+        Each palette color contributes its RGB distance, inflated when it covers
+        little of the image; the best color per asset is the asset's distance.
+        """
+        target = np.asarray(rgb, dtype=np.float32)
+        color_distance = np.linalg.norm(self.palettes.astype(np.float32) - target, axis=2)
+        coverage_penalty = 1.0 / np.sqrt(np.maximum(self.weights, 1e-6))
+        weighted = np.where(self.weights > 0, color_distance * coverage_penalty, np.inf)
+        return weighted.min(axis=1)
+
+    def filter(self, asset_ids, rgb, max_distance=COLOR_MATCH_DISTANCE):
+        """Return the given asset ids whose colors match `rgb`, best match first.
+
+        Assets not analyzed yet cannot be ruled out, so they follow the matches.
+        """
+        if not self.asset_ids:
+            return list(asset_ids)
+        distances = self.distances(rgb)
+        rows = np.array([self.rows.get(asset_id, -1) for asset_id in asset_ids], dtype=np.int64)
+        known = rows >= 0
+        ids = np.asarray(asset_ids, dtype=object)
+        candidates = ids[known]
+        candidate_distances = distances[rows[known]]
+        matching = candidate_distances <= max_distance
+        order = np.argsort(candidate_distances[matching], kind="stable")
+        return list(candidates[matching][order]) + list(ids[~known])
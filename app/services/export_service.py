@@ -0,0 +1,389 @@
+# Services for exporting collections out of the app.
+import json
+import os
+import queue
+import shutil
+import struct
+import tarfile
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config.settings import COMPRESSED_EXTENSIONS, EXPORT_CHUNK_SIZE, EXPORT_QUEUE_DEPTH
+
+
+def collection_files(db, collection_name):
+    """Return the (asset id, path) pairs of a collection, in collection order."""
+    assets = db.data["Assets"]
+    content = db.data["Collections"][collection_name]["content"]
+    return [(asset_id, assets[asset_id]["path"]) for asset_id in content]
+
+
+def export_to_folder(db, collection_name, destination, workers=None, progress=None):
+    """Copy every file of a collection into `destination`, skipping up-to-date copies.
+
+    Returns a dict with the number of files exported and the "path: error" of
+    every file that could not be copied and was skipped.
+    """
+    os.makedirs(destination, exist_ok=True)
+    files = collection_files(db, collection_name)
+    # Files from different import subfolders may share a basename
+    names = unique_member_names(files)
+
+    def copy(asset_id, path):
+        target = os.path.join(destination, names[asset_id])
+        source_stat = os.stat(path)
+        try:
+            target_stat = os.stat(target)
+            if target_stat.st_size == source_stat.st_size and target_stat.st_mtime >= source_stat.st_mtime:
+                return target
+        except FileNotFoundError:
+            pass
+        shutil.copy2(path, target)
+        return target
+
+    skipped = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(copy, asset_id, path): path for asset_id, path in files}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                message = future.result()
+            except OSError as error:
+                skipped.append(f"{futures[future]}: {error}")
+                message = f"skipped {skipped[-1]}"
+            if progress:
+                progress(done, len(files), message)
+    return {"files": len(files) - len(skipped), "skipped": skipped}
+
+
+# Streaming archive export
+#
+# Each member is read and compressed by a worker thread into a bounded queue of
+# chunks, while the calling thread writes members to the archive in collection
+# order. At most `workers` members are in flight, so memory stays bounded by
+# workers * EXPORT_QUEUE_DEPTH * EXPORT_CHUNK_SIZE. Completed members are
+# recorded in a "<archive>.partial" journal so an interrupted export resumes
+# after the last complete member.
+
+ARCHIVE_SUFFIXES = {".zip": "zip", ".tar": "tar", ".tar.gz": "tar.gz", ".tgz": "tar.gz"}
+
+_ZIP64_LIMIT = 0xFFFFFFFF
+
+
+def archive_format(destination):
+    """Return "zip", "tar" or "tar.gz" for an archive path, or None for anything else."""
+    lower = destination.lower()
+    for suffix, archive_type in ARCHIVE_SUFFIXES.items():
+        if lower.endswith(suffix):
+            return archive_type
+    return None
+
+
+def is_compressed(path):
+    return os.path.splitext(path)[1].lower() in COMPRESSED_EXTENSIONS
+
+
+def unique_member_names(files):
+    """Map each asset id to an archive member name, de-duplicating equal basenames."""
+    names = {}
+    used = set()
+    for asset_id, path in files:
+        base, extension = os.path.splitext(os.path.basename(path))
+        name = base + extension
+        counter = 2
+        while name in used:
+            name = f"{base} ({counter}){extension}"
+            counter += 1
+        used.add(name)
+        names[asset_id] = name
+    return names
+
+
+def _put(chunks, item, cancel):
+    """Put into a bounded queue without blocking forever once the export is cancelled."""
+    while not cancel.is_set():
+        try:
+            chunks.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+
+def _encode_member(path, header, wbits, level, chunks, cancel):
+    """Worker: stream the encoded bytes of one member into `chunks`.
+
+    `wbits` selects raw deflate (-15, zip), gzip (31, tar.gz) or no encoding
+    (None). The last item put is a (crc, size, encoded_size) tuple, or the
+    exception that stopped the worker.
+    """
+    try:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, wbits) if wbits is not None else None
+        crc = 0
+        size = 0
+        encoded_size = 0
+
+        def emit(data):
+            nonlocal encoded_size
+            if compressor is not None:
+                data = compressor.compress(data)
+            if data:
+                encoded_size += len(data)
+                _put(chunks, data, cancel)
+
+        emit(header)
+        with open(path, "rb") as file:
+            while not cancel.is_set():
+                chunk = file.read(EXPORT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+                emit(chunk)
+        if header:
+            # Tar members are padded to whole 512 byte blocks
+            emit(b"\0" * (-size % tarfile.BLOCKSIZE))
+        if compressor is not None:
+            tail = compressor.flush()
+            encoded_size += len(tail)
+            _put(chunks, tail, cancel)
+        _put(chunks, (crc, size, encoded_size), cancel)
+    except Exception as error:
+        _put(chunks, error, cancel)
+
+
+def _dos_datetime(mtime):
+    t = time.localtime(mtime)
+    year = max(t.tm_year, 1980)
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+class _ZipWriter:
+    """Writes zip members whose data is already encoded, patching sizes in afterwards."""
+
+    def __init__(self, archive):
+        self.archive = archive
+
+    def member_encoding(self, path):
+        # (zip method, zlib wbits, level): store already-compressed formats as-is
+        return (0, None, 0) if is_compressed(path) else (8, -15, 6)
+
+    def header(self, name, stat):
+        return b""
+
+    def begin(self, name, stat, method):
+        encoded_name = name.encode("utf-8")
+        dos_time, dos_date = _dos_datetime(stat.st_mtime)
+        entry = {"name": name, "offset": self.archive.tell(), "method": method, "time": dos_time, "date": dos_date}
+        # Sizes always live in the zip64 extra field so members may exceed 4 GiB
+        self.archive.write(struct.pack("<IHHHHHIIIHH", 0x04034b50, 45, 0x800, method, dos_time, dos_date,
+                                       0, _ZIP64_LIMIT, _ZIP64_LIMIT, len(encoded_name), 20))
+        self.archive.write(encoded_name)
+        self.archive.write(struct.pack("<HHQQ", 0x0001, 16, 0, 0))
+        return entry
+
+    def end(self, entry, crc, size, encoded_size):
+        end = self.archive.tell()
+        name_length = len(entry["name"].encode("utf-8"))
+        self.archive.seek(entry["offset"] + 14)
+        self.archive.write(struct.pack("<I", crc))
+        self.archive.seek(entry["offset"] + 30 + name_length + 4)
+        self.archive.write(struct.pack("<QQ", size, encoded_size))
+        self.archive.seek(end)
+        entry.update(crc=crc, size=size, encoded_size=encoded_size, end=end)
+        return entry
+
+    def finish(self, entries):
+        directory_offset = self.archive.tell()
+        for entry in entries:
+            encoded_name = entry["name"].encode("utf-8")
+            extra = b""
+            size, encoded_size, offset = entry["size"], entry["encoded_size"], entry["offset"]
+            if size >= _ZIP64_LIMIT:
+                extra += struct.pack("<Q", size)
+                size = _ZIP64_LIMIT
+            if encoded_size >= _ZIP64_LIMIT:
+                extra += struct.pack("<Q", encoded_size)
+                encoded_size = _ZIP64_LIMIT
+            if offset >= _ZIP64_LIMIT:
+                extra += struct.pack("<Q", offset)
+                offset = _ZIP64_LIMIT
+            if extra:
+                extra = struct.pack("<HH", 0x0001, len(extra)) + extra
+            self.archive.write(struct.pack("<IHHHHHHIIIHHHHHII", 0x02014b50, (3 << 8) | 45, 45, 0x800, entry["method"],
+                                           entry["time"], entry["date"], entry["crc"], encoded_size, size,
+                                           len(encoded_name), len(extra), 0, 0, 0, 0o644 << 16, offset))
+            self.archive.write(encoded_name)
+            self.archive.write(extra)
+        directory_end = self.archive.tell()
+        directory_size = directory_end - directory_offset
+        count = len(entries)
+        if count >= 0xFFFF or directory_offset >= _ZIP64_LIMIT or directory_size >= _ZIP64_LIMIT:
+            self.archive.write(struct.pack("<IQHHIIQQQQ", 0x06064b50, 44, 45, 45, 0, 0,
+                                           count, count, directory_size, directory_offset))
+            self.archive.write(struct.pack("<IIQI", 0x07064b50, 0, directory_end, 1))
+            count = min(count, 0xFFFF)
+            directory_size = min(directory_size, _ZIP64_LIMIT)
+            directory_offset = min(directory_offset, _ZIP64_LIMIT)
+        self.archive.write(struct.pack("<IHHHHIIH", 0x06054b50, 0, 0, count, count,
+                                       directory_size, directory_offset, 0))
+
+
+class _TarWriter:
+    """Writes tar members; for tar.gz every member is its own gzip stream so members
+    can be compressed independently and concatenated."""
+
+    def __init__(self, archive, gzip):
+        self.archive = archive
+        self.gzip = gzip
+
+    def member_encoding(self, path):
+        if not self.gzip:
+            return (None, None, 0)
+        return (None, 31, 0 if is_compressed(path) else 6)
+
+    def header(self, name, stat):
+        info = tarfile.TarInfo(name)
+        info.size = stat.st_size
+        info.mtime = int(stat.st_mtime)
+        info.mode = 0o644
+        return info.tobuf(format=tarfile.PAX_FORMAT, encoding="utf-8", errors="surrogateescape")
+
+    def begin(self, name, stat, method):
+        return {"name": name, "offset": self.archive.tell()}
+
+    def end(self, entry, crc, size, encoded_size):
+        entry.update(crc=crc, size=size, encoded_size=encoded_size, end=self.archive.tell())
+        return entry
+
+    def finish(self, entries):
+        trailer = b"\0" * (2 * tarfile.BLOCKSIZE)
+        if self.gzip:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            trailer = compressor.compress(trailer) + compressor.flush()
+        self.archive.write(trailer)
+
+
+def _load_journal(journal_path, archive_type, collection_name):
+    """Return the completed entries of a previous, interrupted export (or [])."""
+    entries = []
+    try:
+        with open(journal_path, "r") as journal:
+            lines = journal.read().splitlines()
+    except FileNotFoundError:
+        return entries
+    try:
+        header = json.loads(lines[0])
+    except (IndexError, json.JSONDecodeError):
+        return entries
+    if header != {"format": archive_type, "collection": collection_name}:
+        return entries
+    for line in lines[1:]:
+        try:
+            entries.append(json.loads(line))
+        except json.JSONDecodeError:
+            break  # A torn last line: that member is exported again
+    return entries
+
+
+def export_to_archive(db, collection_name, destination, workers=None, progress=None):
+    """Stream a collection into a zip, tar or tar.gz archive, resuming an interrupted export.
+
+    Returns a dict with the number of files and bytes written, the elapsed
+    seconds, the throughput in MB/s and the "path: error" of every file that
+    could not be read and was skipped (reported through `progress` too).
+    """
+    archive_type = archive_format(destination)
+    if archive_type is None:
+        raise ValueError(f"Unsupported archive type: {destination}")
+    workers = workers or os.cpu_count()
+    files = collection_files(db, collection_name)
+    names = unique_member_names(files)
+
+    journal_path = destination + ".partial"
+    entries = _load_journal(journal_path, archive_type, collection_name) if os.path.exists(destination) else []
+    exported = {entry["asset_id"] for entry in entries}
+    pending = iter([(asset_id, path) for asset_id, path in files if asset_id not in exported])
+
+    cancel = threading.Event()
+    in_flight = deque()
+    skipped = []
+    total_bytes = 0
+    start = time.monotonic()
+
+    with open(destination, "r+b" if entries else "wb") as archive, \
+            open(journal_path, "a" if entries else "w") as journal, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        if entries:
+            archive.truncate(entries[-1]["end"])
+            archive.seek(0, os.SEEK_END)
+        else:
+            journal.write(json.dumps({"format": archive_type, "collection": collection_name}) + "\n")
+        writer = _ZipWriter(archive) if archive_type == "zip" else _TarWriter(archive, archive_type == "tar.gz")
+
+        def skip(path, error):
+            skipped.append(f"{path}: {error}")
+            if progress:
+                progress(len(entries), len(files), f"skipped {path}: {error}")
+
+        def submit():
+            for asset_id, path in pending:
+                try:
+                    stat = os.stat(path)
+                    break
+                except OSError as error:
+                    skip(path, error)
+            else:
+                return
+            method, wbits, level = writer.member_encoding(path)
+            header = writer.header(names[asset_id], stat)
+            chunks = queue.Queue(EXPORT_QUEUE_DEPTH)
+            pool.submit(_encode_member, path, header, wbits, level, chunks, cancel)
+            in_flight.append((asset_id, path, stat, method, chunks))
+
+        try:
+            for _ in range(workers):
+                submit()
+            while in_flight:
+                asset_id, path, stat, method, chunks = in_flight.popleft()
+                entry = writer.begin(names[asset_id], stat, method)
+                while True:
+                    item = chunks.get()
+                    if isinstance(item, bytes):
+                        archive.write(item)
+                    else:
+                        break
+                if not isinstance(item, Exception) and archive_type != "zip" and item[1] != stat.st_size:
+                    item = RuntimeError("changed while being exported")
+                if isinstance(item, Exception):
+                    # Cut the partial member off the archive and carry on with the next one
+                    archive.truncate(entry["offset"])
+                    archive.seek(0, os.SEEK_END)
+                    skip(path, item)
+                    submit()
+                    continue
+                crc, size, encoded_size = item
+                entry = writer.end(entry, crc, size, encoded_size)
+                entry["asset_id"] = asset_id
+                entries.append(entry)
+                submit()
+
+                # Only journal a member once its bytes are in the archive file
+                archive.flush()
+                journal.write(json.dumps(entry) + "\n")
+                journal.flush()
+
+                total_bytes += size
+                if progress:
+                    elapsed = max(time.monotonic() - start, 1e-6)
+                    progress(len(entries), len(files), f"{entry['name']} ({total_bytes / elapsed / 1e6:.1f} MB/s)")
+            writer.finish(entries)
+        except BaseException:
+            cancel.set()
+            raise
+
+    os.remove(journal_path)
+    elapsed = max(time.monotonic() - start, 1e-6)
+    return {"files": len(entries), "bytes": total_bytes, "seconds": elapsed, "mb_per_s": total_bytes / elapsed / 1e6,
+            "skipped": skipped}
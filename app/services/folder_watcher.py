@@ -0,0 +1,206 @@
+# Background watcher that imports new files from registered folders.
+import json
+import os
+import threading
+import time
+
+from config.settings import IMAGE_EXTENSIONS, WATCH_INTERVAL, WATCH_SNAPSHOT_FILE
+from .import_service import asset_record
+
+# Directories or files modified this recently are looked at again on the next
+# scan: their mtime may not reflect writes still in progress.
+SETTLE_NS = 2_000_000_000
+
+
+class FolderWatcher:
+    """Periodically rescans the folders listed in AppConfig["watched_folders"].
+
+    A snapshot of every watched directory (inode, mtime and its files as
+    (inode, size, mtime)) is persisted between runs. A rescan costs one stat
+    per directory; only directories whose mtime changed are listed again, and
+    files whose inode is already known are never stat'ed or read.
+
+    Scanning only updates the snapshot in memory; the owner of the Database
+    calls `save()` once the new records are committed, so a crash in between
+    re-finds those files on the next run.
+    """
+
+    def __init__(self, db, snapshot_file=WATCH_SNAPSHOT_FILE, interval=WATCH_INTERVAL, metadata_cache=None):
+        self.db = db
+        self.metadata_cache = metadata_cache
+        self.snapshot_file = snapshot_file
+        self.interval = interval
+        self.snapshot = self.load()
+        self.dirty = False
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._committed = threading.Event()
+        self._thread = None
+
+    def load(self):
+        try:
+            with open(self.snapshot_file, "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save(self):
+        """Persist the snapshot; call after the records of the last scan are committed."""
+        try:
+            with self.lock:
+                if self.dirty:
+                    tmp_filename = self.snapshot_file + ".tmp"
+                    with open(tmp_filename, "w") as file:
+                        json.dump(self.snapshot, file, separators=(",", ":"))
+                    os.replace(tmp_filename, self.snapshot_file)
+                    self.dirty = False
+        finally:
+            self._committed.set()
+
+    def abandon(self, paths):
+        """Call instead of `save()` when committing the records failed: the next scan finds these files again."""
+        for path in paths:
+            self._forget(path)
+        self._committed.set()
+
+    def folders(self):
+        return list(self.db.data["AppConfig"].get("watched_folders", []))
+
+    def add_folder(self, folder):
+        folder = os.path.abspath(folder)
+        folders = self.folders()
+        if folder not in folders:
+            self.db.set_config("watched_folders", folders + [folder])
+
+    def remove_folder(self, folder):
+        folders = self.folders()
+        if folder in folders:
+            folders.remove(folder)
+            self.db.set_config("watched_folders", folders)
+
+    def scan(self):
+        """Rescan every watched folder and return the paths of files that appeared."""
+        with self.lock:
+            new_paths = []
+            seen = set()
+            changed = False
+            for folder in self.folders():
+                changed |= self._scan_tree(folder, new_paths, seen)
+
+            # Forget directories that were deleted or are no longer watched
+            for directory in [directory for directory in self.snapshot if directory not in seen]:
+                del self.snapshot[directory]
+                changed = True
+            self.dirty |= changed
+            return new_paths
+
+    def _forget(self, path):
+        """Drop a file from the snapshot so the next scan finds it again."""
+        with self.lock:
+            entry = self.snapshot.get(os.path.dirname(path))
+            if entry is not None:
+                entry["files"].pop(os.path.basename(path), None)
+                entry["mtime_ns"] = None
+
+    def _scan_tree(self, folder, new_paths, seen):
+        changed = False
+        stack = [folder]
+        while stack:
+            directory = stack.pop()
+            try:
+                stat = os.stat(directory)
+            except OSError:
+                continue
+            seen.add(directory)
+            entry = self.snapshot.get(directory)
+            if entry and entry["inode"] == stat.st_ino and entry["mtime_ns"] == stat.st_mtime_ns:
+                stack.extend(os.path.join(directory, name) for name in entry["dirs"])
+                continue
+
+            entry = self._list_directory(directory, stat, entry, new_paths)
+            self.snapshot[directory] = entry
+            stack.extend(os.path.join(directory, name) for name in entry["dirs"])
+            changed = True
+        return changed
+
+    def _list_directory(self, directory, stat, old_entry, new_paths):
+        """List a changed directory, stat'ing only files with an unknown inode."""
+        old_files = old_entry["files"] if old_entry else {}
+        files = {}
+        dirs = []
+        now = time.time_ns()
+        settled = now - stat.st_mtime_ns >= SETTLE_NS
+        try:
+            with os.scandir(directory) as entries:
+                for item in entries:
+                    if item.is_dir(follow_symlinks=False):
+                        dirs.append(item.name)
+                        continue
+                    if os.path.splitext(item.name)[1].lower() not in IMAGE_EXTENSIONS or not item.is_file():
+                        continue
+                    old = old_files.get(item.name)
+                    if old is not None and old[0] == item.inode():
+                        files[item.name] = old
+                        continue
+                    file_stat = item.stat()
+                    if now - file_stat.st_mtime_ns < SETTLE_NS:
+                        settled = False  # Possibly still being copied: pick it up next time
+                        continue
+                    files[item.name] = [file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns]
+                    new_paths.append(item.path)
+        except OSError:
+            settled = False
+        # An unsettled directory keeps no mtime so the next scan lists it again
+        return {"inode": stat.st_ino, "mtime_ns": stat.st_mtime_ns if settled else None, "files": files, "dirs": dirs}
+
+    def scan_records(self):
+        """Rescan and return asset records (with header metadata if there is a cache) for the new files."""
+        records = []
+        for path in self.scan():
+            try:
+                records.append(asset_record(path))
+            except OSError:
+                self._forget(path)
+        if records and self.metadata_cache is not None:
+            self.metadata_cache.add_to_records(records)
+            self.metadata_cache.save()
+        return records
+
+    def start(self, on_new_records):
+        """Rescan every `interval` seconds (or on `rescan_now`) in a daemon thread.
+
+        `on_new_records` is called from that thread with the records of new
+        files; it must hand them to the thread that owns the Database, which
+        calls `save()` once they are committed. The thread waits for that
+        before scanning again.
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                records = self.scan_records()
+                if records:
+                    self._committed.clear()
+                    on_new_records(records)
+                    while not self._committed.wait(0.5):
+                        if self._stop.is_set():
+                            return
+                else:
+                    self.save()
+                self._wake.wait(self.interval)
+                self._wake.clear()
+
+        self._thread = threading.Thread(target=run, name="FolderWatcher", daemon=True)
+        self._thread.start()
+
+    def rescan_now(self):
+        """Wake the background thread for an immediate rescan."""
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread = None
@@ -0,0 +1,107 @@
+# Services for bringing files from disk into the Database as assets.
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config.settings import IMAGE_EXTENSIONS, IMPORT_BATCH_SIZE, IMPORT_COLLECTION
+
+
+def scan_folder(folder):
+    """Return the sorted absolute paths of every image file below `folder`."""
+    paths = []
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for filename in sorted(files):
+            if os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS:
+                paths.append(os.path.abspath(os.path.join(root, filename)))
+    return paths
+
+
+def asset_record(path):
+    """Build the asset record stored in Database Assets for a file."""
+    stat = os.stat(path)
+    return {
+        "name": os.path.basename(path),
+        "path": path,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "added": time.time()
+    }
+
+
+def try_asset_record(path):
+    """Return (record, None), or (None, error) for a file that vanished or cannot be read."""
+    try:
+        return asset_record(path), None
+    except OSError as error:
+        return None, error
+
+
+def ensure_collection(db, name):
+    if name not in db.data["Collections"]:
+        db.add_button(name, {"name": name, "content": []})
+
+
+def known_paths(db):
+    """Return the set of file paths that are already assets."""
+    return {asset.get("path") for asset in db.data["Assets"].values()}
+
+
+def import_records(db, records, collection_name=IMPORT_COLLECTION, batch_size=IMPORT_BATCH_SIZE, record=True):
+    """Add prepared asset records to a collection, one commit per batch. Returns the new ids.
+
+    `record=False` keeps the commits out of the undo history (automatic imports).
+    """
+    with db.transaction(record=record):
+        ensure_collection(db, collection_name)
+    new_ids = []
+    for start in range(0, len(records), batch_size):
+        with db.transaction(record=record):
+            batch_ids = [db.add_asset(asset) for asset in records[start:start + batch_size]]
+            db.add_to_collection(collection_name, batch_ids)
+        new_ids.extend(batch_ids)
+    return new_ids
+
+
+def import_files(db, paths, collection_name=IMPORT_COLLECTION, workers=None, progress=None, batch_size=IMPORT_BATCH_SIZE,
+                 metadata_cache=None):
+    """Import files as assets into a collection and return the new asset ids.
+
+    Files are stat'ed in a thread pool and committed in batches of `batch_size`,
+    so an interrupted import keeps every batch that was already written.
+    Paths that are already assets are skipped, and files that cannot be
+    stat'ed are reported (through `progress`, else on stderr) and skipped.
+    With a `metadata_cache` the header metadata of each file is stored in
+    its record as well.
+    """
+    existing = known_paths(db)
+    paths = [path for path in paths if path not in existing]
+
+    new_ids = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(paths), batch_size):
+            batch = paths[start:start + batch_size]
+            records = []
+            for path, (record, error) in zip(batch, pool.map(try_asset_record, batch)):
+                if record is not None:
+                    records.append(record)
+                    continue
+                message = f"skipped {path}: {error}"
+                if progress:
+                    progress(len(new_ids), len(paths), message)
+                else:
+                    print(message, file=sys.stderr)
+            if metadata_cache is not None:
+                metadata_cache.add_to_records(records, workers)
+            new_ids.extend(import_records(db, records, collection_name, batch_size))
+            if progress:
+                progress(len(new_ids), len(paths), batch[-1])
+    if metadata_cache is not None:
+        metadata_cache.save()
+    return new_ids
+
+
+def import_folder(db, folder, collection_name=IMPORT_COLLECTION, workers=None, progress=None, metadata_cache=None):
+    """Scan a folder and import every image found into a collection."""
+    return import_files(db, scan_folder(folder), collection_name, workers, progress, metadata_cache=metadata_cache)
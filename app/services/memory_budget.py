@@ -0,0 +1,97 @@
+# Central memory budget shared by every cache in the app.
+import threading
+from collections import OrderedDict
+
+from config.settings import MEMORY_LIMIT
+
+# How many of the least recently used entries are compared when picking a victim
+EVICTION_WINDOW = 8
+
+
+class MemoryBudget:
+    """Tracks the size of every cached entry against one global limit.
+
+    Caches register a name, an eviction callback and a rebuild cost weight,
+    then charge each entry they hold. When the total exceeds the limit the
+    budget evicts among the least recently used entries, preferring the ones
+    that are cheapest to rebuild, by calling the owning cache's callback.
+    Caches registered without a callback are only reported, never evicted,
+    and pinned entries (still in use, e.g. shown on screen) are skipped.
+    """
+
+    def __init__(self, limit=MEMORY_LIMIT):
+        self.limit = limit
+        self.caches = {}
+        self.entries = OrderedDict()  # (cache name, key) -> size, least recently used first
+        self.usage_by_cache = {}
+        self.pinned = set()  # (cache name, key) entries that must not be evicted
+        self.lock = threading.RLock()
+
+    def register(self, name, evict=None, cost=1.0, size=None):
+        """Register a cache. `size` is an optional callable for caches that report a total only."""
+        with self.lock:
+            self.caches[name] = {"evict": evict, "cost": cost, "size": size}
+            self.usage_by_cache.setdefault(name, 0)
+
+    def charge(self, name, key, size):
+        """Record (or update) the size of an entry and mark it most recently used."""
+        with self.lock:
+            entry = (name, key)
+            self.usage_by_cache[name] += size - self.entries.pop(entry, 0)
+            self.entries[entry] = size
+            self._enforce(protect=entry)
+
+    def touch(self, name, key):
+        with self.lock:
+            if (name, key) in self.entries:
+                self.entries.move_to_end((name, key))
+
+    def pin(self, name, keys):
+        """Replace the set of `name` entries in use. Evicting those would free nothing, so they stay charged."""
+        with self.lock:
+            self.pinned = {entry for entry in self.pinned if entry[0] != name} | {(name, key) for key in keys}
+
+    def release(self, name, key):
+        """Forget an entry the cache dropped by itself."""
+        with self.lock:
+            self.usage_by_cache[name] -= self.entries.pop((name, key), 0)
+
+    def release_all(self, name):
+        with self.lock:
+            for entry in [entry for entry in self.entries if entry[0] == name]:
+                self.usage_by_cache[name] -= self.entries.pop(entry)
+
+    def usage(self):
+        """Return {cache name: bytes}, including caches that only report a total."""
+        with self.lock:
+            usage = dict(self.usage_by_cache)
+            for name, cache in self.caches.items():
+                if cache["size"] is not None:
+                    usage[name] = cache["size"]()
+            return usage
+
+    def total(self):
+        return sum(self.usage().values())
+
+    def _enforce(self, protect=None):
+        """Evict entries until the tracked total fits the limit."""
+        reported = sum(cache["size"]() for cache in self.caches.values() if cache["size"] is not None)
+        while sum(self.usage_by_cache.values()) + reported > self.limit:
+            victim = self._pick_victim(protect)
+            if victim is None:
+                return
+            name, key = victim
+            self.usage_by_cache[name] -= self.entries.pop(victim)
+            self.caches[name]["evict"](key)
+
+    def _pick_victim(self, protect):
+        candidates = []
+        for entry in self.entries:
+            if entry != protect and entry not in self.pinned and self.caches[entry[0]]["evict"] is not None:
+                candidates.append(entry)
+                if len(candidates) == EVICTION_WINDOW:
+                    break
+        if not candidates:
+            return None
+        # Cheapest to rebuild per byte first; ties go to the least recently used
+        return min(candidates, key=lambda entry: self.caches[entry[0]]["cost"] / max(self.entries[entry], 1))
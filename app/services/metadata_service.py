@@ -0,0 +1,202 @@
+# Services for extracting intrinsic image metadata from file headers.
+import json
+import os
+from io import BytesIO
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config.settings import METADATA_CACHE_FILE
+
+try:
+    from PIL import Image
+except ImportError:  # Without Pillow only dimensions and format are read
+    Image = None
+
+try:
+    from PIL import ImageCms
+except ImportError:
+    ImageCms = None
+
+METADATA_FIELDS = ("width", "height", "format", "color_profile", "captured")
+
+# EXIF tags: DateTimeOriginal lives in the Exif sub-IFD, DateTime in IFD0
+EXIF_IFD = 0x8769
+DATE_TIME_ORIGINAL = 36867
+DATE_TIME = 306
+
+
+def _exif_date(value):
+    """Turn an EXIF "YYYY:MM:DD HH:MM:SS" stamp into ISO 8601, or None."""
+    if not isinstance(value, str) or len(value) < 19:
+        return None
+    return value[:10].replace(":", "-") + "T" + value[11:19]
+
+
+def _header_exif(image):
+    """EXIF found while parsing the header; never calls Image.getexif for PNG, which decodes every pixel."""
+    raw = image.info.get("exif")
+    if raw:
+        exif = Image.Exif()
+        exif.load(raw)
+        return exif
+    if image.format == "TIFF":
+        # TIFF tags are the header itself
+        return image.getexif()
+    return Image.Exif()
+
+
+def _read_with_pillow(path):
+    # Image.open only parses the header; pixel data is never decoded here
+    with Image.open(path) as image:
+        metadata = {"width": image.width, "height": image.height, "format": image.format}
+        icc = image.info.get("icc_profile")
+        if icc:
+            try:
+                metadata["color_profile"] = ImageCms.getProfileDescription(ImageCms.ImageCmsProfile(BytesIO(icc))).strip()
+            except Exception:
+                metadata["color_profile"] = "embedded"
+        else:
+            metadata["color_profile"] = None
+        exif = _header_exif(image)
+        captured = exif.get_ifd(EXIF_IFD).get(DATE_TIME_ORIGINAL) or exif.get(DATE_TIME)
+        metadata["captured"] = _exif_date(captured)
+        return metadata
+
+
+def _read_jpeg_size(file):
+    """Walk JPEG segments up to the first start-of-frame marker."""
+    file.seek(2)
+    while True:
+        marker = file.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code == 0xFF:
+            file.seek(-1, os.SEEK_CUR)  # Fill byte
+            continue
+        (length,) = struct.unpack(">H", file.read(2))
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">xHH", file.read(5))
+            return width, height
+        file.seek(length - 2, os.SEEK_CUR)
+
+
+def _read_header(path):
+    """Read dimensions and format from the first bytes of PNG, GIF, BMP and JPEG files."""
+    with open(path, "rb") as file:
+        head = file.read(32)
+        if head.startswith(b"\x89PNG\r\n\x1a\n"):
+            width, height = struct.unpack(">II", head[16:24])
+            image_format = "PNG"
+        elif head[:6] in (b"GIF87a", b"GIF89a"):
+            width, height = struct.unpack("<HH", head[6:10])
+            image_format = "GIF"
+        elif head.startswith(b"BM"):
+            width, height = struct.unpack("<ii", head[18:26])
+            height = abs(height)
+            image_format = "BMP"
+        elif head.startswith(b"\xff\xd8"):
+            size = _read_jpeg_size(file)
+            if size is None:
+                return {}
+            width, height = size
+            image_format = "JPEG"
+        else:
+            return {}
+    return {"width": width, "height": height, "format": image_format, "color_profile": None, "captured": None}
+
+
+def read_metadata(path):
+    """Return the header metadata of an image file ({} if it cannot be read)."""
+    try:
+        if Image is not None:
+            return _read_with_pillow(path)
+        return _read_header(path)
+    except Exception:
+        return {}
+
+
+class MetadataCache:
+    """Header metadata keyed by path and validated against the file's (size, mtime).
+
+    Only files whose size or mtime changed since they were cached are read
+    again. Safe to use from worker threads.
+    """
+
+    def __init__(self, filename=METADATA_CACHE_FILE):
+        self.filename = filename
+        self.entries = self.load()
+        self.lock = threading.Lock()
+        self.dirty = False
+
+    def load(self):
+        try:
+            with open(self.filename, "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            tmp_filename = self.filename + ".tmp"
+            with open(tmp_filename, "w") as file:
+                json.dump(self.entries, file, separators=(",", ":"))
+            os.replace(tmp_filename, self.filename)
+            self.dirty = False
+
+    def get(self, path, size, mtime):
+        """Return cached metadata, reading the header only if the file changed."""
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] == size and entry[1] == mtime:
+            return entry[2]
+        metadata = read_metadata(path)
+        with self.lock:
+            self.entries[path] = [size, mtime, metadata]
+            self.dirty = True
+        return metadata
+
+    def add_to_records(self, records, workers=None):
+        """Merge metadata into asset records (which carry path, size and mtime) in a thread pool."""
+        def extract(record):
+            return self.get(record["path"], record.get("size"), record.get("mtime"))
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for record, metadata in zip(records, pool.map(extract, records)):
+                record.update(metadata)
+        return records
+
+
+def refresh_assets(db, cache, asset_ids=None, workers=None, progress=None):
+    """Re-stat assets and update the records of files whose size or mtime changed.
+
+    Unchanged files are answered from the cache without being opened. Every
+    changed record is written in one transaction. Returns the number updated.
+    """
+    assets = db.data["Assets"]
+    asset_ids = list(assets) if asset_ids is None else list(asset_ids)
+
+    def refresh(asset_id):
+        record = assets[asset_id]
+        try:
+            stat = os.stat(record["path"])
+        except (OSError, KeyError):
+            return None
+        metadata = cache.get(record["path"], stat.st_size, stat.st_mtime)
+        updated = dict(record, size=stat.st_size, mtime=stat.st_mtime, **metadata)
+        return updated if updated != record else None
+
+    changed = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for done, (asset_id, updated) in enumerate(zip(asset_ids, pool.map(refresh, asset_ids)), 1):
+            if updated is not None:
+                changed[asset_id] = updated
+            if progress:
+                progress(done, len(asset_ids), asset_id)
+
+    if changed:
+        db.update_assets(changed)
+    cache.save()
+    return len(changed)
@@ -0,0 +1,161 @@
+# Cached sort permutations of collection contents.
+import bisect
+import colorsys
+
+
+class Permutation:
+    """A collection's asset ids in sorted order, with the key each was sorted by."""
+
+    def __init__(self, keyed):
+        self.keys = sorted(keyed)
+        self.ids = [asset_id for _, asset_id in self.keys]
+        self.key_of = dict((asset_id, key) for key, asset_id in self.keys)
+
+    def insert(self, key, asset_id):
+        position = bisect.bisect(self.keys, (key, asset_id))
+        self.keys.insert(position, (key, asset_id))
+        self.ids.insert(position, asset_id)
+        self.key_of[asset_id] = key
+
+    def insert_many(self, keyed):
+        """Merge several (key, asset_id) pairs in one pass over the permutation."""
+        keyed = sorted(keyed)
+        # Two sorted runs: the list sort merges them in linear time
+        self.keys += keyed
+        self.keys.sort()
+        self.ids = [asset_id for _, asset_id in self.keys]
+        self.key_of.update((asset_id, key) for key, asset_id in keyed)
+
+    def remove(self, asset_id):
+        key = self.key_of.pop(asset_id, None)
+        if key is None:
+            return
+        position = bisect.bisect_left(self.keys, (key, asset_id))
+        del self.keys[position]
+        del self.ids[position]
+
+    def remove_many(self, asset_ids):
+        """Remove several assets in one pass over the permutation."""
+        for asset_id in asset_ids:
+            self.key_of.pop(asset_id, None)
+        self.keys = [item for item in self.keys if item[1] not in asset_ids]
+        self.ids = [asset_id for _, asset_id in self.keys]
+
+
+class SortIndex:
+    """Sort permutations per (collection, sort option), kept up to date incrementally.
+
+    Sort keys are computed once per asset when a permutation is built.
+    Committed transactions patch cached permutations: appended assets are
+    merged in and removed ones are deleted. Only collections whose assets
+    changed are dropped. Switching the sort order swaps a cached list.
+    """
+
+    name = "Sort orders"
+
+    def __init__(self, db, color_index=None, budget=None):
+        self.db = db
+        self.color_index = color_index
+        self.budget = budget
+        self.cache = {}
+        self.key_functions = {
+            "Date added": lambda asset: asset.get("added", 0),
+            "Name": lambda asset: asset.get("name", "").lower(),
+            "File size": lambda asset: asset.get("size", 0),
+            "Dimensions": lambda asset: asset.get("width", 0) * asset.get("height", 0),
+            "Color": self.color_key,
+        }
+        db.listeners.append(self.on_commit)
+        if budget is not None:
+            budget.register(self.name, evict=lambda cache_key: self.cache.pop(cache_key, None), cost=4.0)
+
+    def _charge(self, cache_key):
+        """Report a permutation's approximate size: a key tuple, a list slot and a dict slot per asset."""
+        permutation = self.cache.get(cache_key)
+        if self.budget is not None and permutation is not None:
+            self.budget.charge(self.name, cache_key, 200 * len(permutation.ids) + 200)
+
+    def color_key(self, asset):
+        """Hue, then lightness, of the asset's dominant color; unanalyzed assets sort last."""
+        index = self.color_index
+        row = index.rows.get(asset.get("id")) if index is not None else None
+        if row is None:
+            return (2.0, 0.0)
+        red, green, blue = (int(channel) / 255 for channel in index.palettes[row][0])
+        hue, lightness, saturation = colorsys.rgb_to_hls(red, green, blue)
+        # Greys have no meaningful hue: group them after the colors
+        return (hue if saturation > 0.15 else 1.5, lightness)
+
+    def key(self, sort_option, asset_id):
+        return self.key_functions[sort_option](self.db.data["Assets"].get(asset_id, {}))
+
+    def order(self, collection_name, sort_option, reverse=False):
+        """Return a new list of the collection's asset ids in the given sort order.
+
+        Cached permutations are patched in place by later commits, so callers
+        never get the cached list itself.
+        """
+        permutation = self.cache.get((collection_name, sort_option))
+        if permutation is None:
+            content = self.db.data["Collections"][collection_name]["content"]
+            permutation = Permutation((self.key(sort_option, asset_id), asset_id) for asset_id in content)
+            self.cache[(collection_name, sort_option)] = permutation
+            self._charge((collection_name, sort_option))
+        elif self.budget is not None:
+            self.budget.touch(self.name, (collection_name, sort_option))
+        return permutation.ids[::-1] if reverse else list(permutation.ids)
+
+    def invalidate(self, collection_name=None, sort_option=None):
+        """Drop cached permutations matching the given collection and/or sort option."""
+        for cache_key in list(self.cache):
+            if collection_name in (None, cache_key[0]) and sort_option in (None, cache_key[1]):
+                del self.cache[cache_key]
+                if self.budget is not None:
+                    self.budget.release(self.name, cache_key)
+
+    def on_commit(self, journal, record=True):
+        """Patch the cached permutations touched by a committed transaction."""
+        touched = {key for _, section, key, _ in journal if section == "Collections"}
+        self._patch(journal)
+        for cache_key in [cache_key for cache_key in self.cache if cache_key[0] in touched]:
+            self._charge(cache_key)
+
+    def _insert(self, collection_name, asset_ids):
+        for (name, sort_option), permutation in self.cache.items():
+            if name != collection_name:
+                continue
+            if len(asset_ids) == 1:
+                permutation.insert(self.key(sort_option, asset_ids[0]), asset_ids[0])
+            else:
+                permutation.insert_many((self.key(sort_option, asset_id), asset_id) for asset_id in asset_ids)
+
+    def _patch(self, journal):
+        i = 0
+        while i < len(journal):
+            op, section, key, old = journal[i]
+            i += 1
+            if section == "Collections" and op == "append":
+                # A run of appends to one collection is merged in a single pass
+                asset_ids = [old]
+                while i < len(journal) and journal[i][0] == "append" and journal[i][2] == key:
+                    asset_ids.append(journal[i][3])
+                    i += 1
+                self._insert(key, asset_ids)
+            elif section == "Collections" and op == "remove":
+                _, asset_id = old
+                for (name, _), permutation in self.cache.items():
+                    if name == key:
+                        permutation.remove(asset_id)
+            elif section == "Collections" and op == "insert_many":
+                self._insert(key, [asset_id for _, asset_id in old])
+            elif section == "Collections" and op == "remove_many":
+                asset_ids = {asset_id for _, asset_id in old}
+                for (name, _), permutation in self.cache.items():
+                    if name == key:
+                        permutation.remove_many(asset_ids)
+            elif section == "Collections":
+                self.invalidate(collection_name=key)
+            elif section == "Assets" and op == "put" and key in self.db.data["Assets"] and isinstance(old, dict):
+                # An edited asset may have moved in every collection that contains it
+                for name in self.db.collections_for(key):
+                    self.invalidate(collection_name=name)
@@ -0,0 +1,126 @@
+# Services for generating and reading asset thumbnail pyramids.
+#
+# Every asset gets one packed ".pyr" file holding a PNG per level
+# (THUMBNAIL_LEVELS). The file starts with a fixed-size header:
+#
+#     b"APYR", version (u8), level count (u8),
+#     then per level: edge (u16), offset (u32), length (u32)
+#
+# so reading any level is one header read, one seek and one read. PNG is used
+# because Tk's PhotoImage decodes it without Pillow.
+import io
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from config.settings import THUMBNAIL_DIR, THUMBNAIL_LEVELS
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional for the data layer
+    Image = None
+
+PYRAMID_MAGIC = b"APYR"
+PYRAMID_VERSION = 1
+HEADER = struct.Struct("<4sBB")
+LEVEL = struct.Struct("<HII")
+# Large enough for the header of any pyramid with up to 8 levels
+HEADER_READ_SIZE = HEADER.size + 8 * LEVEL.size
+
+
+def pyramid_path(asset_id, thumbnail_dir=THUMBNAIL_DIR):
+    """Pyramids are sharded by the first two characters of the id to keep directories small."""
+    return os.path.join(thumbnail_dir, asset_id[:2], f"{asset_id}.pyr")
+
+
+def make_pyramid(source, destination, levels=THUMBNAIL_LEVELS):
+    """Write the thumbnail pyramid of `source` to `destination`. Returns an error message or None."""
+    try:
+        blobs = {}
+        with Image.open(source) as image:
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+            # Each level is resized from the next larger one, which is much cheaper than from the original
+            for edge in sorted(levels, reverse=True):
+                image.thumbnail((edge, edge))
+                buffer = io.BytesIO()
+                image.save(buffer, format="PNG", optimize=False)
+                blobs[edge] = buffer.getvalue()
+
+        edges = sorted(blobs)
+        offset = HEADER.size + LEVEL.size * len(edges)
+        header = [HEADER.pack(PYRAMID_MAGIC, PYRAMID_VERSION, len(edges))]
+        for edge in edges:
+            header.append(LEVEL.pack(edge, offset, len(blobs[edge])))
+            offset += len(blobs[edge])
+
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        tmp_destination = destination + ".tmp"
+        with open(tmp_destination, "wb") as file:
+            file.write(b"".join(header))
+            for edge in edges:
+                file.write(blobs[edge])
+        os.replace(tmp_destination, destination)
+    except Exception as error:
+        return f"{source}: {error}"
+    return None
+
+
+def read_levels(file):
+    """Return [(edge, offset, length), ...] from an open pyramid file."""
+    data = file.read(HEADER_READ_SIZE)
+    magic, version, count = HEADER.unpack_from(data)
+    if magic != PYRAMID_MAGIC or version != PYRAMID_VERSION:
+        raise ValueError("not a thumbnail pyramid")
+    return [LEVEL.unpack_from(data, HEADER.size + i * LEVEL.size) for i in range(count)]
+
+
+def nearest_level(levels, edge):
+    """Pick the smallest level at least `edge` pixels, or the largest one available."""
+    for level in levels:
+        if level[0] >= edge:
+            return level
+    return levels[-1]
+
+
+def read_level(path, edge):
+    """Return (level edge, PNG bytes) of the pyramid level nearest to `edge`, or None if missing."""
+    try:
+        with open(path, "rb") as file:
+            level_edge, offset, length = nearest_level(read_levels(file), edge)
+            file.seek(offset)
+            return level_edge, file.read(length)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def is_stale(asset, destination):
+    """A pyramid is stale if missing or older than its source file."""
+    try:
+        return os.stat(destination).st_mtime < asset.get("mtime", 0)
+    except FileNotFoundError:
+        return True
+
+
+def generate_thumbnails(db, asset_ids=None, force=False, workers=None, progress=None, thumbnail_dir=THUMBNAIL_DIR):
+    """Generate missing or stale thumbnail pyramids on every core. Returns the list of errors."""
+    if Image is None:
+        raise RuntimeError("Pillow is required to generate thumbnails.")
+
+    assets = db.data["Assets"]
+    asset_ids = list(assets) if asset_ids is None else list(asset_ids)
+    jobs = []
+    for asset_id in asset_ids:
+        destination = pyramid_path(asset_id, thumbnail_dir)
+        if force or is_stale(assets[asset_id], destination):
+            jobs.append((assets[asset_id]["path"], destination))
+
+    errors = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(make_pyramid, source, destination) for source, destination in jobs]
+        for done, future in enumerate(as_completed(futures), 1):
+            error = future.result()
+            if error:
+                errors.append(error)
+            if progress:
+                progress(done, len(jobs), error or "ok")
+    return errors
@@ -0,0 +1,39 @@
+# Services for checking the Database against the files on disk.
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+def check_asset(asset):
+    """Return a problem description for an asset, or None if its file is intact."""
+    path = asset.get("path")
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, TypeError):
+        return f"missing file: {path}"
+    if "size" in asset and stat.st_size != asset["size"]:
+        return f"size changed: {path}"
+    return None
+
+
+def verify_database(db, workers=None, progress=None):
+    """Check every asset file and every collection reference. Returns a list of problems."""
+    problems = []
+    assets = db.data["Assets"]
+
+    for name, collection in db.data["Collections"].items():
+        for asset_id in collection["content"]:
+            if asset_id not in assets:
+                problems.append(f"collection '{name}' references unknown asset {asset_id}")
+
+    asset_ids = list(assets)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(check_asset, (assets[asset_id] for asset_id in asset_ids))
+        for done, (asset_id, problem) in enumerate(zip(asset_ids, results), 1):
+            if problem:
+                problems.append(f"asset {asset_id}: {problem}")
+            if progress:
+                progress(done, len(asset_ids), problem or "ok")
+
+    for asset_id in db.orphan_assets():
+        problems.append(f"asset {asset_id} is not in any collection")
+    return problems
@@ -0,0 +1,58 @@
+# Compares the binary snapshot with the JSON database file: load time, save
+# time and file size for growing libraries of realistic asset records. Run
+# from the repository root:
+#   python -m benchmarks.bench_snapshot
+import os
+import random
+import tempfile
+import time
+
+from app.data.database import Database
+
+
+def build(filename, asset_count):
+    """A library like an import plus a metadata refresh produces, saved as JSON."""
+    rng = random.Random(asset_count)
+    db = Database(filename, "json")
+    with db.transaction():
+        asset_ids = []
+        for i in range(asset_count):
+            path = f"/home/user/Pictures/{2015 + i // 20_000}/{i // 500:03d}/IMG_{i:05d}.jpg"
+            asset_ids.append(db.add_asset({
+                "name": os.path.basename(path), "path": path, "size": rng.randint(10 ** 5, 10 ** 7),
+                "mtime": 1.6e9 + rng.random() * 1e8, "added": 1.7e9 + rng.random() * 1e6,
+                "width": 4000, "height": 3000, "format": "JPEG", "color_profile": None, "captured": None,
+            }))
+        db.add_button("All", {"name": "All", "content": []})
+        db.add_to_collection("All", asset_ids)
+    return db
+
+
+def best_of(runs, function):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        print(f"{'assets':>8} {'format':>8} {'load':>8} {'save':>8} {'size':>10}")
+        for asset_count in (10_000, 50_000, 100_000):
+            json_file = os.path.join(folder, f"bench_{asset_count}.json")
+            binary_file = os.path.join(folder, f"bench_{asset_count}.snap")
+            db = build(json_file, asset_count)
+            binary = Database(binary_file, "binary")
+            binary.data = db.data
+            for file_format, target in (("json", db), ("binary", binary)):
+                save = best_of(3, target.save)
+                load = best_of(3, lambda: Database(target.filename, file_format))
+                size = os.path.getsize(target.filename) / 2 ** 20
+                print(f"{asset_count:>8} {file_format:>8} {load:>7.3f}s {save:>7.3f}s {size:>8.1f}MB")
+            assert Database(binary_file, "binary").data == db.data
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# Times Database transactions against a baseline that saves once per item: a
+# transaction costs O(changes) in memory plus one save, while committing each
+# item costs O(changes x file size). Run from the repository root:
+#   python -m benchmarks.bench_transactions
+import os
+import tempfile
+import time
+
+from app.data.database import Database
+
+
+def build(filename, asset_count):
+    db = Database(filename, "json")
+    with db.transaction():
+        asset_ids = [db.add_asset({"name": f"{i}.jpg", "path": f"/photos/{i}.jpg"}, f"a{i}") for i in range(asset_count)]
+        db.add_button("Source", {"name": "Source", "content": []})
+        db.add_button("Target", {"name": "Target", "content": []})
+        db.add_to_collection("Source", asset_ids)
+    return db
+
+
+def time_move(db, count):
+    """Return (seconds without the save, seconds including the one save) of moving `count` assets."""
+    asset_ids = db.data["Collections"]["Source"]["content"][:count]
+    save = db.save
+    db.save = lambda: None
+    started = time.perf_counter()
+    db.move_assets("Source", "Target", asset_ids)
+    in_memory = time.perf_counter() - started
+    db.save = save
+    db.move_assets("Target", "Source", asset_ids)
+    started = time.perf_counter()
+    db.move_assets("Source", "Target", asset_ids)
+    total = time.perf_counter() - started
+    db.move_assets("Target", "Source", asset_ids)
+    return in_memory, total
+
+
+def time_move_per_item(db, count):
+    """Baseline: the same move with one commit, and so one full save, per asset."""
+    asset_ids = db.data["Collections"]["Source"]["content"][:count]
+    started = time.perf_counter()
+    for asset_id in asset_ids:
+        db.move_assets("Source", "Target", [asset_id])
+    total = time.perf_counter() - started
+    db.move_assets("Target", "Source", asset_ids)
+    return total
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        print(f"{'assets':>8} {'moved':>8} {'in memory':>10} {'one save':>10} {'save per item':>14}")
+        for asset_count in (10_000, 50_000, 100_000):
+            db = build(os.path.join(folder, f"bench_{asset_count}.json"), asset_count)
+            for count in (1, 100, 10_000):
+                in_memory, total = time_move(db, count)
+                # Saving per item costs count x file size; only measured where that finishes quickly
+                baseline = f"{time_move_per_item(db, count):>13.4f}s" if count <= 100 else f"{'-':>14}"
+                print(f"{asset_count:>8} {count:>8} {in_memory:>9.4f}s {total:>9.4f}s {baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,49 @@
 # Here, you'd define configuration settings like database connection details.
+
+DATABASE_FILE = "database.json"
+
+# Collection that receives freshly imported assets
+IMPORT_COLLECTION = "Newly Imported"
+
+# File extensions picked up when importing a folder
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif", ".tiff", ".webp"}
+
+# Number of assets written per database commit during bulk imports
+IMPORT_BATCH_SIZE = 500
+
+# Where thumbnail pyramids are stored, and the longest edge of each level in pixels
+THUMBNAIL_DIR = "thumbnails"
+THUMBNAIL_LEVELS = (64, 128, 256, 512)
+
+# Archive export: bytes read per chunk and chunks buffered per worker
+EXPORT_CHUNK_SIZE = 1024 * 1024
+EXPORT_QUEUE_DEPTH = 4
+
+# Already-compressed formats that are stored in archives instead of recompressed
+COMPRESSED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".zip", ".gz", ".bz2", ".xz", ".7z", ".mp4", ".mov"}
+
+# Dominant-color index: array file, palette size and default match distance (RGB units)
+COLOR_INDEX_FILE = "color_index.npz"
+COLOR_PALETTE_SIZE = 5
+COLOR_MATCH_DISTANCE = 60
+
+# Watched import folders: persisted directory snapshot and seconds between rescans
+WATCH_SNAPSHOT_FILE = "watch_snapshot.json"
+WATCH_INTERVAL = 30
+
+# Sort orders offered for collection contents, in menu order
+SORT_OPTIONS = ["Date added", "Name", "File size", "Dimensions", "Color"]
+
+# Undo history: maximum number of steps and approximate memory they may hold
+HISTORY_DEPTH = 100
+HISTORY_MEMORY_CAP = 32 * 1024 * 1024
+
+# Global memory budget (bytes) shared by the in-memory caches
+MEMORY_LIMIT = 512 * 1024 * 1024
+
+# Format Database.save writes: "json" (readable) or "binary" (compact snapshot, faster to load).
+# Loading detects the format of the existing file either way.
+DATABASE_FORMAT = "json"
+
+# Cache of header metadata (dimensions, format, color profile, capture date) keyed by path, size and mtime
+METADATA_CACHE_FILE = "metadata_cache.json"
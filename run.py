@@ -1,4 +1,10 @@
-from app.main import run_app
+import sys
 
 if __name__ == "__main__":
-    run_app()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        # Any arguments select the headless batch mode
+        from app.cli import main
+        sys.exit(main(sys.argv[1:]))
+
+    from app.main import run_app
+    run_app()
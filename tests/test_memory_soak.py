@@ -0,0 +1,117 @@
+# Soak test: scrolling a 100k-asset collection grid keeps memory bounded by the budget.
+#
+# Needs a display, customtkinter and Pillow; it is skipped without them. It runs
+# in a temporary directory so the real database and thumbnails are never touched.
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import tkinter as tk
+import unittest
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSET_COUNT = 100_000
+SCROLL_STEPS = 150
+LIMIT = 32 * 1024 * 1024
+
+
+def peak_rss():
+    """Peak resident set size in bytes (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+class GridScrollSoakTest(unittest.TestCase):
+    def setUp(self):
+        if resource is None:
+            self.skipTest("resource module not available")
+        for module in ("customtkinter", "PIL"):
+            if importlib.util.find_spec(module) is None:
+                self.skipTest(f"{module} is not installed")
+        try:
+            tk.Tk().destroy()
+        except tk.TclError as error:
+            self.skipTest(f"no display: {error}")
+
+        self.old_cwd = os.getcwd()
+        self.folder = tempfile.mkdtemp()
+        os.chdir(self.folder)
+        # The sidebar loads its icons relative to the working directory
+        os.makedirs(os.path.join("app", "gui"))
+        os.symlink(os.path.join(REPO_ROOT, "app", "gui", "icons"), os.path.join("app", "gui", "icons"))
+
+        from PIL import Image
+        from app.data.database import Database
+        from app.services.thumbnail_service import make_pyramid, pyramid_path
+
+        # A few distinct pyramids, hard linked under 100k asset ids
+        sources = []
+        for i, color in enumerate([(200, 40, 40), (40, 200, 40), (40, 40, 200), (200, 200, 40)]):
+            path = os.path.join(self.folder, f"source{i}.png")
+            Image.new("RGB", (600, 400), color).save(path)
+            self.assertIsNone(make_pyramid(path, path + ".pyr"))
+            sources.append(path)
+
+        db = Database("database.json")
+        with db.transaction():
+            content = []
+            for i in range(ASSET_COUNT):
+                source = sources[i % len(sources)]
+                asset_id = db.add_asset({"name": f"{i}.png", "path": source, "added": i}, f"{i:032x}")
+                destination = pyramid_path(asset_id)
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                try:
+                    os.link(source + ".pyr", destination)
+                except OSError:
+                    shutil.copyfile(source + ".pyr", destination)
+                content.append(asset_id)
+            db.add_button("Soak", {"name": "Soak", "content": content})
+
+    def tearDown(self):
+        if hasattr(self, "old_cwd"):
+            os.chdir(self.old_cwd)
+            shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_scrolling_keeps_memory_bounded(self):
+        from app.gui.main_window import App, CollectionsPage
+
+        app = App()
+        try:
+            app.memory_budget.limit = LIMIT
+            page = app.pages[CollectionsPage]
+            app.selected = "Soak"
+            page.set_zoom(64)
+            page.on_selection_changed()
+            app.update()
+            self.assertEqual(len(page.order), ASSET_COUNT)
+
+            def scroll(start, stop):
+                for step in range(start, stop):
+                    page.canvas.yview_moveto(step / SCROLL_STEPS)
+                    page.render_visible()
+                    app.update()
+                    thumbnails = app.memory_budget.usage()["Thumbnails"]
+                    visible = sum(frame.image.width() * frame.image.height() * 4
+                                  for frame, _ in page.tiles.values() if frame.image is not None)
+                    # Only the pinned images on screen may push the cache past the limit
+                    self.assertLessEqual(thumbnails, LIMIT + visible)
+
+            # The first pass warms up Tk and the allocator; the second must not keep growing
+            scroll(0, SCROLL_STEPS // 2)
+            warm = peak_rss()
+            scroll(SCROLL_STEPS // 2, SCROLL_STEPS)
+            scroll(0, SCROLL_STEPS)
+            self.assertLess(peak_rss() - warm, 2 * LIMIT)
+        finally:
+            app.folder_watcher.stop()
+            app.destroy()
+
+
+if __name__ == "__main__":
+    unittest.main()